@@ -9,12 +9,18 @@ Keithley_2600_channels script. Some from Keithley_2000
 """
 
 
+import logging
+import time
 import numpy as np
 from functools import partial
+from pyvisa.errors import VisaIOError
 
 from qcodes import VisaInstrument
+from qcodes.instrument.parameter import ArrayParameter
 import qcodes.utils.validators as vals
 
+log = logging.getLogger(__name__)
+
 
 def parse_output_string(s):
     """ Used for mode parsing since Keithley 2812 adds an unnecessary :DC """
@@ -40,6 +46,20 @@ def parse_output_bool(value):
         raise ValueError('Must be boolean, 0 or 1, True or False')
 
 
+class BurstParameter(ArrayParameter):
+    """ The readings of one burst (see Keithley_2182a.burst_setup) """
+    def __init__(self, name: str, instrument, points: int, **kwargs):
+        super().__init__(name, instrument=instrument, shape=(points,),
+                         label='Voltage', unit='V',
+                         setpoints=(tuple(range(points)),),
+                         setpoint_names=('reading_nr',),
+                         setpoint_labels=('Reading number',),
+                         docstring='Readings of one burst', **kwargs)
+
+    def get_raw(self):
+        return self.instrument.burst_get()
+
+
 class Keithley_2182a(VisaInstrument):
     """
     The Instrument driver for the Keithley 2182a nanovoltmeter
@@ -58,6 +78,11 @@ class Keithley_2182a(VisaInstrument):
         self.vranges = [[0.01, 0.1, 1., 10., 100.], [0.1, 1, 10]]  # not used
         self.tempranges = []  # not used at the moment
         self.trigreadstart = False
+        # Read the trace buffer as binary doubles (switched off automatically
+        # if that fails)
+        self.binary_trace = True
+        # How often (s) to check the status byte once a burst should be done
+        self.burst_poll_interval = 0.01
 
         self.add_parameter('mode',
                            get_cmd='SENS:FUNC?',
@@ -293,3 +318,109 @@ class Keithley_2182a(VisaInstrument):
             self.trigreadstart = False
         else:
             print('Not in a triggered measurement state')
+
+    def burst_setup(self, points: int, external: bool=False, timeout=None):
+        """ Sets up burst acquisition: the 2182a takes points readings at the
+        configured NPLC into its trace buffer without any bus traffic, and
+        they're read back in one (binary) transfer. With external=True each
+        reading waits for a trigger on the trigger link, e.g. from a 6221
+        sweep, so the readings line up with the source steps.
+
+        Creates the parameters burst (the readings as an array, shape
+        (points,)) and burst_average. Each get runs one burst; to run the
+        source in between use burst_start() and burst_fetch().
+
+        points: readings per burst (up to 1024, the buffer size)
+        external: trigger each reading from the trigger link
+        timeout: seconds to wait for a burst. Default: twice the expected
+            time plus 5 s, or 60 s for external triggering
+        """
+        if not 1 <= points <= 1024:
+            raise ValueError('points must be between 1 and 1024')
+        self._burst_points = int(points)
+        self._burst_external = external
+        # with autozero on, each reading takes about two integrations
+        self._burst_duration = (2*points*self.nplc() /
+                                float(self.ask('SYST:LFR?')))
+        if timeout is None:
+            timeout = 60 if external else 2*self._burst_duration + 5
+        self._burst_timeout = timeout
+
+        self.write('ABOR;:INIT:CONT OFF')
+        self.trigreadstart = False
+        if external:
+            self.write('TRIG:SOUR EXT;COUN {};:SAMP:COUN 1'.format(points))
+        else:
+            self.write('TRIG:SOUR IMM;COUN 1;:SAMP:COUN {}'.format(points))
+        self.write('TRAC:POIN {};FEED SENS'.format(points))
+
+        for name in ('burst', 'burst_average'):
+            if name in self.parameters:
+                del self.parameters[name]
+        self.add_parameter('burst', parameter_class=BurstParameter,
+                           points=self._burst_points)
+        self.add_parameter('burst_average',
+                           label='Voltage',
+                           unit='V',
+                           get_cmd=lambda: np.mean(self.burst_get()))
+
+    def burst_start(self):
+        """ Clears the buffer and starts a burst (see burst_setup) without
+        waiting. Completion is flagged through *OPC in the status byte """
+        self.write('TRAC:CLE;FEED:CONT NEXT;*CLS;*ESE 1;:INIT;*OPC')
+        self._burst_t0 = time.perf_counter()
+
+    def burst_done(self):
+        """ True when the burst started with burst_start is complete (event
+        summary bit of the status byte, read with a serial poll) """
+        try:
+            stb = self.visa_handle.read_stb()
+        except (VisaIOError, NotImplementedError):
+            stb = int(self.ask('*STB?'))
+        return bool(stb & 32)
+
+    def burst_fetch(self):
+        """ Waits for the burst started with burst_start to complete and
+        returns its readings as an array (NaN for readings missing after
+        the timeout) """
+        if not self._burst_external:
+            # nothing to poll for until the readings can have been taken
+            time.sleep(max(0, self._burst_t0 + self._burst_duration/2 -
+                           time.perf_counter()))
+        while not self.burst_done():
+            if time.perf_counter() - self._burst_t0 > self._burst_timeout:
+                print('Burst did not appear to finish')
+                self.write('ABOR')
+                break
+            time.sleep(self.burst_poll_interval)
+
+        data = np.full(self._burst_points, np.nan)
+        values = self._read_trace()[:self._burst_points]
+        data[:len(values)] = values
+        return data
+
+    def burst_get(self):
+        """ Runs one burst and returns the readings """
+        self.burst_start()
+        return self.burst_fetch()
+
+    def _read_trace(self):
+        """ The readings in the trace buffer, as binary doubles if
+        binary_trace is True, otherwise (or if that fails) as ASCII """
+        if self.binary_trace:
+            self.write('FORM:BORD SWAP;DATA DRE')
+            try:
+                return self.visa_handle.query_binary_values(
+                    'TRAC:DATA?', datatype='d', is_big_endian=False,
+                    container=np.array)
+            except (VisaIOError, ValueError) as e:
+                log.warning('{}: binary buffer read failed ({}), reading '
+                            'as ASCII from now on'.format(self.name, e))
+                self.binary_trace = False
+                self.device_clear()
+            finally:
+                self.write('FORM:DATA ASC')
+        reply = self.ask('TRAC:DATA?').strip()
+        if not reply:
+            return np.empty(0)
+        return np.array(reply.split(','), dtype=float)
@@ -6,17 +6,25 @@ Created on Fri Jan 19 13:32:00 2018
 @author: robertpolski
 """
 
+import logging
 import numpy as np
 from typing import Union
+from pyvisa.errors import VisaIOError
 
 from qcodes import VisaInstrument
 from qcodes.instrument.parameter import ArrayParameter, MultiParameter
 import qcodes.utils.validators as vals
 import time
+from concurrent.futures import CancelledError
 from functools import partial
 
+log = logging.getLogger(__name__)
+
 boolcheck = (0, 1, 'on', 'off', 'ON', 'OFF', False, True)
 
+# One buffer entry as returned by TRAC:DATA? with FORM:ELEM READ,TST
+TRACE_DTYPE = np.dtype([('reading', 'f8'), ('time', 'f8')])
+
 
 def parse_output_bool(value):
     if int(value) == 1 or int(value) == 0:
@@ -72,22 +80,141 @@ class SweepTimeParameter(MultiParameter):
         return self.get_cmd()
 
 
-class Keithley_6221(VisaInstrument):
+class DeltaRun:
+    """ A delta or differential conductance run started with
+    Keithley_6221.delta_start. It's used like a concurrent.futures.Future,
+    but completion is only checked when asked for (with a serial poll of the
+    status byte), so nothing talks to the 6221 in the background and other
+    instruments can be measured while the run goes on:
+
+        run = k6.delta_start()
+        T = triton.MC_temp()
+        data = run.result()
+
+    duration: expected length of the run (s). Nothing is polled before then
+    timeout: deadline (s from the start) after which wait() gives up and
+        result() raises TimeoutError
     """
-    Instrument Driver for Keithley 6221 current source
+    def __init__(self, instrument, parse, duration, timeout):
+        self._instrument = instrument
+        self._parse = parse
+        self._t0 = time.perf_counter()
+        self.expected_end = self._t0 + duration
+        self.deadline = self._t0 + timeout
+        self._done = False
+        self._cancelled = False
+        self._has_result = False
+        self._result = None
+        self.n_fetched = 0
+
+    def done(self):
+        """ True if the run completed (or was cancelled) """
+        if not self._done and not self._cancelled:
+            self._done = self._instrument._operation_complete()
+        return self._done or self._cancelled
+
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        """ Aborts the run (abort_arm). Returns False if it had already
+        completed """
+        if self.done():
+            return self._cancelled
+        self._instrument.abort_arm()
+        self._cancelled = True
+        return True
+
+    def wait(self, timeout=None):
+        """ Waits for the run to complete, for at most timeout seconds (or
+        until the deadline). Returns True if it completed """
+        end = self.deadline
+        if timeout is not None:
+            end = min(end, time.perf_counter() + timeout)
+        poll_interval = self._instrument.delta_poll_interval
+        while not self.done():
+            now = time.perf_counter()
+            if now >= end:
+                return False
+            # no point polling before the run can have finished
+            time.sleep(min(max(self.expected_end - now, poll_interval),
+                           end - now))
+        return not self._cancelled
+
+    def fetch_new(self):
+        """ Reads only the buffer entries added since the last fetch
+        (TRAC:POIN:ACT?, then TRAC:DATA:SEL? for the new ones) and returns
+        them as a TRACE_DTYPE array, which may be empty. n_fetched is the
+        buffer index of the next entry """
+        n = self._instrument.trace_count()
+        if n <= self.n_fetched:
+            return np.empty(0, dtype=TRACE_DTYPE)
+        new = self._instrument.read_trace(self.n_fetched, n - self.n_fetched)
+        self.n_fetched += len(new)
+        return new
+
+    def stream(self, poll_interval=0.5):
+        """ Yields blocks of new buffer entries (see fetch_new) every
+        poll_interval seconds while the run goes on, and the last ones once
+        it is complete. cancel() from the loop stops the run early; the
+        entries taken until then are still yielded. Raises TimeoutError at
+        the deadline """
+        while True:
+            finished = self.done()
+            new = self.fetch_new()
+            if len(new):
+                yield new
+            if finished:
+                return
+            now = time.perf_counter()
+            if now >= self.deadline:
+                raise TimeoutError('{} delta run not complete after {:.1f} '
+                                   's'.format(self._instrument.name,
+                                              now - self._t0))
+            time.sleep(min(poll_interval, self.deadline - now))
+
+    def result(self, timeout=None):
+        """ Waits for the run (see wait) and returns the data read from the
+        buffer, in the same form as the blocking get command """
+        if self._cancelled:
+            raise CancelledError()
+        if not self._has_result:
+            if not self.wait(timeout):
+                raise TimeoutError('{} delta run not complete after {:.1f} '
+                                   's'.format(self._instrument.name,
+                                              time.perf_counter() - self._t0))
+            if self._parse is not None:
+                self._result = self._parse()
+            self._has_result = True
+        return self._result
+
+
+class Keithley6221Base:
     """
-    def __init__(self, name: str, address: str, reset: bool=False, **kwargs):
-        """
-        Args:
-            name: Name to use internally in QCoDeS
-            address: VISA ressource address
-            reset: Set Keithley to defaults? True or False
-        """
-        super().__init__(name, address, terminator='\n', **kwargs)
-
+    The parameters and measurement functions (AC, delta, differential
+    conductance, buffer readout, 2182 passthrough) of the Keithley 6221,
+    independent of the connection. Keithley_6221 (VISA) and
+    Keithley_6221_rs232 (pyserial) add the connection: write_raw and
+    ask_raw, and faster versions of _read_status_byte and _read_trace_binary
+    where the connection has them. They call _add_6221_parameters() once
+    connected.
+    """
+    def _add_6221_parameters(self):
+        """ Adds the parameters and functions, and the state they use """
         self._ac_init = False
         self._ac_ampl = False
         self._ac_freq = False
+        # waveform set by the AC helpers: SIN, or ARB0 after AC_arb_setup
+        self._ac_func = 'SIN'
+        # Read the buffer as binary doubles (only if the connection supports
+        # it, see _read_trace_binary)
+        self.binary_trace = False
+        # Whether the buffer format for ASCII reads (FORM:ELEM READ,TST;
+        # FORM:DATA ASC) is set, so read_trace only sends it once
+        self._trace_ascii_format = False
+        # How often (s) to check the status byte once a delta run should be
+        # about done
+        self.delta_poll_interval = 0.01
 
         self.add_parameter('current',
                            label='Current',
@@ -95,7 +222,7 @@ class Keithley_6221(VisaInstrument):
                            set_cmd='SOUR:CURR {}',
                            get_parser=float,
                            unit='A',
-                           vals=vals.Numbers())
+                           vals=vals.Numbers(-105e-3, 105e-3))
         self.add_parameter('output',
                            get_cmd='OUTP:STAT?',
                            set_cmd='OUTP:STAT {}',
@@ -223,6 +350,11 @@ class Keithley_6221(VisaInstrument):
         self.add_parameter('diff_arm',
                            get_cmd='SOUR:DCON:ARM?',
                            get_parser=int)
+        self.add_parameter('trace_count',
+                           label='Buffer entries',
+                           snapshot_get=False,
+                           get_cmd='TRAC:POIN:ACT?',
+                           get_parser=int)
         self.add_parameter('delta_IV_sweep',  # STILL A WORK IN PROGRESS
                            snapshot_get=False,
                            get_cmd=self.delta_IV_sweep_get,
@@ -299,22 +431,21 @@ class Keithley_6221(VisaInstrument):
                            vals=vals.Enum('MOV', 'REP'))
 
         self.add_function('abort_arm', call_cmd='SOUR:SWE:ABOR')
-        self.add_function('reset', call_cmd='*RST')
+        self.add_function('reset', call_cmd=self._reset)
         # TODO: Getting error messages doesn't work
         self.add_function('get_error', call_cmd='SYST:ERR?')
 
-        if reset:
-            self.reset()
-
-        self.connect_message()
+    def _reset(self):
+        self.write('*RST')
+        # *RST puts the buffer format back to its defaults
+        self._trace_ascii_format = False
 
     def _setac_amplitude(self, amp):
         """This is just the helper function for the AC_amplitude parameter"""
         if self._ac_freq is False:
             print('Must enter frequency')
         if self._ac_init is False:
-            self.write('SOUR:WAVE:FUNC SIN')
-            self.write('SOUR:WAVE:AMPL {}'.format(amp))
+            self.write('SOUR:WAVE:FUNC {};AMPL {}'.format(self._ac_func, amp))
         else:
             self.write('SOUR:WAVE:AMPL {}'.format(amp))
         self._ac_ampl = True
@@ -324,8 +455,8 @@ class Keithley_6221(VisaInstrument):
         if self._ac_ampl is False:
             print('Must enter amplitude')
         if self._ac_init is False:
-            self.write('SOUR:WAVE:FUNC SIN')
-            self.write('SOUR:WAVE:FREQ {}'.format(freq))
+            self.write('SOUR:WAVE:FUNC {};FREQ {}'.format(self._ac_func,
+                                                          freq))
         else:
             self.write('SOUR:WAVE:FREQ {}'.format(freq))
         self._ac_freq = True
@@ -335,8 +466,7 @@ class Keithley_6221(VisaInstrument):
             print('Must enter frequency')
         if self._ac_ampl is False:
             print('Must enter amplitude')
-        self.write('SOUR:WAVE:ARM')
-        self.write('SOUR:WAVE:INIT')
+        self.write('SOUR:WAVE:ARM;INIT')
         self._ac_init = True
 
     def abort_AC(self):
@@ -346,6 +476,116 @@ class Keithley_6221(VisaInstrument):
             self.write('SOUR:WAVE:ABOR')
             self._ac_init = False
 
+    def _write_list(self, cmd, append_cmd, values, chunk_size):
+        """ Sends a list of values as cmd with the first chunk_size values
+        and append_cmd for each following chunk, so that no single command
+        gets too long for the 6221 """
+        values = np.asarray(values, dtype=float).ravel()
+        for i in range(0, len(values), chunk_size):
+            chunk = ','.join(map('{:.9g}'.format,
+                                 values[i:i + chunk_size].tolist()))
+            self.write('{} {}'.format(append_cmd if i else cmd, chunk))
+
+    def AC_arb_setup(self, waveform, amplitude, frequency, offset=0,
+                     chunk_size=100, start=False):
+        """ Uploads an arbitrary waveform and sets it up as the AC output
+        (SOUR:WAVE:FUNC ARB0) instead of the sine, e.g. a staircase for an
+        amplitude ramp runs on the 6221 instead of a loop of AC_amplitude
+        sets. Start it with AC_init (or start=True) and stop it with
+        abort_AC; AC_amplitude, AC_frequency etc. keep working on it.
+        Use AC_arb_setup again to change it, or AC_sine to go back to the
+        sine.
+
+        waveform: 2 to 65536 points of one period, between -1 and 1
+            (numpy array or list)
+        amplitude: peak current (A) that 1 corresponds to
+        frequency: repetition frequency of the whole waveform (Hz)
+        offset: DC offset (A)
+        chunk_size: points sent per command
+        """
+        waveform = np.asarray(waveform, dtype=float).ravel()
+        if not 2 <= len(waveform) <= 65536:
+            raise ValueError('waveform must have 2 to 65536 points')
+        if np.any(np.abs(waveform) > 1) or not np.all(np.isfinite(waveform)):
+            raise ValueError('waveform must be between -1 and 1')
+        if self._ac_init:
+            self.abort_AC()
+        self._write_list('SOUR:WAVE:ARB:DATA', 'SOUR:WAVE:ARB:APP', waveform,
+                         chunk_size)
+        self._ac_func = 'ARB0'
+        self.write('SOUR:WAVE:FUNC ARB0;AMPL {};FREQ {};OFFS {}'.format(
+            amplitude, frequency, offset))
+        for param, value in (('AC_amplitude', amplitude),
+                             ('AC_frequency', frequency),
+                             ('AC_offset', offset)):
+            param = self.parameters[param]
+            if hasattr(param, 'cache'):
+                param.cache.set(value)
+            else:
+                param._save_val(value)
+        self._ac_ampl = True
+        self._ac_freq = True
+        if start:
+            self.AC_init()
+
+    def AC_sine(self):
+        """ Switches the AC output back to a sine after AC_arb_setup """
+        self._ac_func = 'SIN'
+        self.write('SOUR:WAVE:FUNC SIN')
+
+    def list_sweep_setup(self, currents, delays=1e-3, compliance=None,
+                         count=1, cab=False, ranging='BEST', chunk_size=100):
+        """ Uploads a DC current list sweep (SOUR:LIST:CURR) and arms it.
+        Start it with list_sweep_start, which returns right away, so a whole
+        stepped excitation runs on the 6221 instead of a loop of current
+        sets.
+
+        currents: the currents (A) in order, up to 65535 (numpy array or
+            list)
+        delays: time (s) at each current, one value or one per current
+        compliance: voltage compliance (V), one value or one per current
+            (default: the compliance parameter)
+        count: number of times the list is run (or 'INF')
+        cab: True aborts if compliance is crossed
+        ranging: 'BEST' uses the best fixed range for all currents, 'AUTO'
+            changes range as needed, 'FIX' keeps the present range
+        chunk_size: points sent per command
+        """
+        currents = np.asarray(currents, dtype=float).ravel()
+        n = len(currents)
+        if not 1 <= n <= 65535:
+            raise ValueError('currents must have 1 to 65535 points')
+        if compliance is None:
+            compliance = self.compliance()
+        delays = np.broadcast_to(np.asarray(delays, dtype=float), (n,))
+        compliance = np.broadcast_to(np.asarray(compliance, dtype=float),
+                                     (n,))
+        if self.delta_arm() == 1 or self.diff_arm() == 1:
+            print('Delta or differential conductance mode is armed. '
+                  'Need to abort first.')
+            return
+
+        self.write('SOUR:SWE:SPAC LIST;RANG {};COUN {};CAB {}'.format(
+            ranging, count, int(bool(cab))))
+        self._write_list('SOUR:LIST:CURR', 'SOUR:LIST:CURR:APP', currents,
+                         chunk_size)
+        self._write_list('SOUR:LIST:DEL', 'SOUR:LIST:DEL:APP', delays,
+                         chunk_size)
+        self._write_list('SOUR:LIST:COMP', 'SOUR:LIST:COMP:APP', compliance,
+                         chunk_size)
+        self._list_duration = float(np.sum(delays))*(
+            1 if count == 'INF' else count)
+        self.write('SOUR:SWE:ARM')
+
+    def list_sweep_start(self, timeout=None):
+        """ Starts the list sweep armed by list_sweep_setup and returns a
+        DeltaRun for it without waiting: run.wait() waits for the end,
+        run.done() checks it and run.cancel() aborts the sweep.
+
+        timeout: seconds after which wait() gives up (default twice the
+            total of the delays plus 10 s)"""
+        return self._start_run(None, self._list_duration, timeout)
+
     def delta_trigger_return(self):
         """ Triggers, waits, parses, and returns the results of a delta sweep.
 
@@ -360,47 +600,95 @@ class Keithley_6221(VisaInstrument):
             print('Need to run a delta or differential conductance setup')
             return
 
-        self.write('INIT:IMM')
-
-        time.sleep(self._delta_delay*self._delta_points)
-        # reset the timeout to account for possible extra time
-        self._old_timeout = self.timeout()
-        if self._delta_points/2 > 5:
-            self.timeout(self._delta_points/2)
-        else:
-            self.timeout(5)
-        count = 0
-        while not int(self.ask('*OPC?')):  # Wait until done. Try if this works
-            time.sleep(1)
-            if count > 5:
-                print('Delta function did not appear to finish')
-                break
-            count += 1
-
-        self.timeout(self._old_timeout)
-
-        _floatdata = np.fromstring(self.ask('TRAC:DATA?'), sep=',')
-        _vals = np.zeros(int(len(_floatdata)/2))
+        run = self._start_run(self._delta_trace_result,
+                              self._delta_delay*self._delta_points)
+        try:
+            return run.result()
+        except TimeoutError:
+            print('Delta function did not appear to finish')
+            return self._delta_trace_result()
+
+    def _delta_trace_result(self):
+        """ The buffer after a constdelta or deltadcon run, as returned by
+        delta_trigger_return """
+        trace = self.read_trace()
+        if len(trace) == self._delta_points + 1:
+            trace = trace[1:]
 
         if self._delta_time_meas:
-            _times = np.zeros(int(len(_floatdata)/2))
-            for i in range(len(_floatdata)):
-                if np.mod(i, 2) == 0:
-                    _vals[int(i/2)] = _floatdata[i]
-                else:
-                    _times[int((i-1)/2)] = _floatdata[i]
-            if len(_vals) == self._delta_points + 1:
-                _vals = _vals[1:]
-            if len(_times) == self._delta_points + 1:
-                _times = _times[1:]
-            return (_vals, _times)
+            return (trace['reading'], trace['time'])
+        else:
+            return trace['reading']
+
+    def _operation_complete(self):
+        """ Whether the operation flagged with *OPC has completed, from the
+        event summary bit of the status byte """
+        return bool(self._read_status_byte() & 32)
+
+    def _read_status_byte(self):
+        return int(self.ask('*STB?'))
+
+    def _start_run(self, parse, duration, timeout=None):
+        """ Starts the armed sweep and flags its completion with *OPC, which
+        sets the event summary bit of the status byte """
+        if timeout is None:
+            timeout = 2*duration + 10
+        self.write('*CLS;*ESE 1;:INIT:IMM;*OPC')
+        return DeltaRun(self, parse, duration, timeout)
+
+    def delta_start(self, timeout=None):
+        """ Starts the run armed by const_delta_setup or delta_diff_setup and
+        returns without waiting for it. The returned DeltaRun gives the same
+        data as constdelta()/deltadcon() with .result(), once the run is
+        complete.
+
+        timeout: seconds after which the run counts as failed (default twice
+            the expected time plus 10 s)"""
+        if self.delta_arm() != 1 and self.diff_arm() != 1:
+            raise RuntimeError('Need to run a delta or differential '
+                               'conductance setup')
+        return self._start_run(self._delta_trace_result,
+                               self._delta_delay*self._delta_points,
+                               timeout)
+
+    def read_trace(self, start=None, count=None):
+        """ Reads the whole buffer (TRAC:DATA?) in one transfer and returns it
+        as a structured array with the fields 'reading' and 'time' (see
+        TRACE_DTYPE), e.g. trace['reading']. With start and count, only
+        count entries from index start are read (TRAC:DATA:SEL?).
+
+        The buffer is sent as binary doubles when binary_trace is True, which
+        are used as they are without parsing. Otherwise (or if the binary
+        read fails, after which binary_trace is switched off) it's read as
+        ASCII and parsed in one go."""
+        if start is None:
+            query = 'TRAC:DATA?'
         else:
-            for i in range(len(_floatdata)):
-                if np.mod(i, 2) == 0:
-                    _vals[int(i/2)] = _floatdata[i]
-            if len(_vals) == self._delta_points + 1:
-                _vals = _vals[1:]
-            return _vals
+            query = 'TRAC:DATA:SEL? {},{}'.format(start, count)
+        if self.binary_trace:
+            try:
+                return self._read_trace_binary(query)
+            except (VisaIOError, ValueError, NotImplementedError) as e:
+                log.warning('{}: binary buffer read failed ({}), reading '
+                            'as ASCII from now on'.format(self.name, e))
+                self.binary_trace = False
+        if not self._trace_ascii_format:
+            self.write('FORM:ELEM READ,TST;:FORM:DATA ASC')
+            self._trace_ascii_format = True
+        return self._parse_trace(self.ask(query))
+
+    def _read_trace_binary(self, query):
+        raise NotImplementedError('No binary transfers over this connection')
+
+    @staticmethod
+    def _parse_trace(text):
+        """ Parses an ASCII buffer readout (reading, time, reading, time, ...)
+        into a TRACE_DTYPE array """
+        text = text.strip()
+        if not text:
+            return np.empty(0, dtype=TRACE_DTYPE)
+        data = np.array(text.split(','), dtype='f8')
+        return data[:len(data) - len(data) % 2].view(TRACE_DTYPE)
 
     def const_delta_setup(self, high: Union[int, float], points: int, delay=0,
                           low: Union[int, float, None]=None, cab: bool=False,
@@ -469,6 +757,7 @@ class Keithley_6221(VisaInstrument):
 
         if 'constdelta' in self.parameters:
             del self.parameters['constdelta']
+        self._delta_param = 'constdelta'
 
         if timemeas:  # untested timemeas
             countarray = np.linspace(1, len(self.sweep_current),
@@ -579,6 +868,7 @@ class Keithley_6221(VisaInstrument):
 
         if 'deltadcon' in self.parameters:
             del self.parameters['deltadcon']
+        self._delta_param = 'deltadcon'
 
         if timemeas:  # untested timemeas
             countarray = np.linspace(1, len(self.sweep_current),
@@ -670,28 +960,100 @@ class Keithley_6221(VisaInstrument):
         if self.delta_arm() == 0:
             print('Run delta_IV_sweep_set first')
             return
-        self.write('INIT:IMM')
-
-        self._old_timeout = self.timeout()
-        if self._deltaptsavg > 4:
-            self.timeout((self._deltaptsavg+2)*self._delta_delay + 2)
-        else:
-            self.timeout((self._deltaptsavg+2)*self._delta_delay + 5)
-        count = 0
-        while not int(self.ask('*OPC?')):  # Wait until done. Try if this works
-            time.sleep(.1)
-            if count > 50:
-                print('Delta function did not appear to finish')
-                break
-            count += 1
-
-        _floatdata = np.fromstring(self.ask('TRAC:DATA?'), sep=',')
+        run = self._start_run(self._delta_IV_sweep_result,
+                              (self._deltaptsavg+1)*self._delta_delay)
+        try:
+            return run.result()
+        except TimeoutError:
+            print('Delta function did not appear to finish')
+            return self._delta_IV_sweep_result()
+
+    def _delta_IV_sweep_result(self):
+        trace = self.read_trace()
         self.abort_arm()
-        _vals = np.zeros(self._deltaptsavg)
-        for i in range(len(_floatdata)):
-                if np.mod(i, 2) == 0 and i > 0:
-                    _vals[int((i-2)/2)] = _floatdata[i]
-        return np.average(_vals)
+        # the first reading is only the start of the delta cycle
+        return np.average(trace['reading'][1:self._deltaptsavg + 1])
+
+    def delta_IV_curve_setup(self, currents, delay=0.5, ptsavg=1,
+                             cab=False):
+        """ Sets up fast delta IV curves for 2D maps: the delta delay, count,
+        compliance abort and buffer size are programmed once here, and the
+        parameter delta_IV_curve measures the whole curve (one row of the
+        map) each time it's read, e.g.
+
+            k6.delta_IV_curve_setup(np.linspace(-1e-6, 1e-6, 41))
+            single_param_sweep(gate, gatevals, 0.1, k6.delta_IV_curve)
+
+        For each current only the amplitude is sent, armed and started in
+        one write, completion is taken from the status byte and the readings
+        are read in one binary transfer, instead of the full re-programming,
+        arm checks and *OPC? polling of delta_IV_sweep_set/get. (The 6221
+        can't run a list of amplitudes in delta mode; only pulse delta takes
+        a current list.)
+
+        currents: the delta amplitudes (A) of the curve; each point uses
+            +current and -current
+        delay: the delta delay between when the current value is set and when
+                the 2182a measures.
+        ptsavg: number of delta readings averaged per point
+        cab: True aborts if compliance is crossed
+
+        delta_IV_curve returns the average and standard deviation of the
+        readings of each point (deltaV, deltaV_std)."""
+        if self.delta_arm() == 1 or self.diff_arm() == 1:
+            print('Delta or differential conductance mode is armed. '
+                  'Need to abort first.')
+            return
+        if self.k2182_present() != 1:
+            print('2182 is not connected properly through the RS-232 port')
+            return
+        if ptsavg < 1:
+            print('ptsavg must be at least 1')
+            return
+
+        self._ivc_currents = np.asarray(currents, dtype=float)
+        self._ivc_ptsavg = int(ptsavg)
+        self._ivc_delay = delay
+        self.write('SOUR:DELT:DEL {};CAB {};COUN {}'.format(
+            delay, int(bool(cab)), self._ivc_ptsavg + 1))
+        self.write('TRAC:POIN {}'.format(self._ivc_ptsavg + 1))
+
+        if 'delta_IV_curve' in self.parameters:
+            del self.parameters['delta_IV_curve']
+        n = len(self._ivc_currents)
+        self.add_parameter('delta_IV_curve', names=('deltaV', 'deltaV_std'),
+                           parameter_class=SweepTimeParameter,
+                           labels=('Delta Mode Voltage',
+                                   'Delta Mode Voltage std'),
+                           shapes=((n,), (n,)),
+                           units=('V', 'V'),
+                           setpoints=((tuple(self._ivc_currents),),
+                                      (tuple(self._ivc_currents),)),
+                           setpoint_names=(('current',), ('current',)),
+                           setpoint_labels=(('Current',), ('Current',)),
+                           setpoint_units=(('A',), ('A',)),
+                           get_cmd=self.delta_IV_curve_get)
+
+    def delta_IV_curve_get(self):
+        """ Measures the IV curve set up with delta_IV_curve_setup. Returns
+        (averages, standard deviations) of the delta readings, one per
+        current """
+        n = self._ivc_ptsavg
+        readings = np.full((len(self._ivc_currents), n), np.nan)
+        duration = (n + 1)*self._ivc_delay
+        for i, current in enumerate(self._ivc_currents):
+            self.write('SOUR:DELT:HIGH {};LOW {};ARM'.format(current,
+                                                             -current))
+            run = self._start_run(None, duration)
+            if not run.wait():
+                print('Delta function did not appear to finish at '
+                      '{} A'.format(current))
+            trace = self.read_trace()
+            self.abort_arm()
+            # the first reading is only the start of the delta cycle
+            point = trace['reading'][1:n + 1]
+            readings[i, :len(point)] = point
+        return np.nanmean(readings, axis=1), np.nanstd(readings, axis=1)
 
     # Now a function for reading from the k2182 when plugged into the 6221
     # through an RS-232 port
@@ -705,3 +1067,129 @@ class Keithley_6221(VisaInstrument):
         val = self.ask('SYST:COMM:SER:SEND "{}"\nSYST:COMM:SER:ENT?'.format(cmd))
         # nothing = self.visa_handle.read()
         return val
+
+    def k2_write(self, cmd):
+        """ Sends a command to the 2182 through the RS-232 link """
+        self.write('SYST:COMM:SER:SEND "{}"'.format(cmd))
+
+    def _k2_enter(self):
+        """ Whatever the 2182 has sent back over the link so far """
+        return self.ask('SYST:COMM:SER:ENT?').strip()
+
+    def k2_buffer_setup(self, points, timeout=None):
+        """ Sets up buffered 2182 readings through the RS-232 link: the 2182
+        takes points readings on its own into its buffer, and they are read
+        back in one transfer, instead of two serial hops per reading as with
+        k2_measure. Don't use it while a delta mode is armed (the 6221 uses
+        the link then).
+
+        Creates the parameters k2_buffer (all the readings of a batch, as an
+        array) and k2_buffer_average (their mean). Each get runs one batch.
+
+        points: readings per batch (up to 1024, the 2182 buffer size)
+        timeout: seconds to wait for a batch (default from the 2182 NPLC)
+        """
+        if not 1 <= points <= 1024:
+            raise ValueError('points must be between 1 and 1024')
+        self._k2_points = int(points)
+        if timeout is None:
+            # a reading takes NPLC line cycles (at 50 Hz in the worst case),
+            # twice that with autozero
+            timeout = 2*(2*self._k2_points*self.k2_nplc()/50) + 5
+        self._k2_timeout = timeout
+        self.k2_write('TRIG:SOUR IMM;COUN {0};:INIT:CONT OFF;'
+                      ':TRAC:POIN {0};FEED SENS'.format(self._k2_points))
+
+        for name in ('k2_buffer', 'k2_buffer_average'):
+            if name in self.parameters:
+                del self.parameters[name]
+        self.add_parameter('k2_buffer', parameter_class=SweepParameter,
+                           label='Voltage',
+                           shape=(self._k2_points,),
+                           unit='V',
+                           setpoints=(tuple(range(self._k2_points)),),
+                           setpoint_names=('reading_nr',),
+                           setpoint_units=('',),
+                           get_cmd=self.k2_buffer_get)
+        self.add_parameter('k2_buffer_average',
+                           label='Voltage',
+                           unit='V',
+                           get_cmd=lambda: np.mean(self.k2_buffer_get()))
+
+    def k2_buffer_get(self, poll_interval=0.05):
+        """ Runs one batch of buffered 2182 readings (see k2_buffer_setup)
+        and returns them as an array. The batch is started with a single
+        send; the 2182 answers *OPC? when it's done, and the buffer comes
+        back with one TRAC:DATA? """
+        self._k2_enter()  # drop anything left over
+        self.k2_write('TRAC:CLE;FEED:CONT NEXT;:INIT;*OPC?')
+        t0 = time.perf_counter()
+        while not self._k2_enter():
+            if time.perf_counter() - t0 > self._k2_timeout:
+                print('2182 readings did not appear to finish')
+                break
+            time.sleep(poll_interval)
+
+        t0 = time.perf_counter()
+        reply = self.k2_read_cmd('TRAC:DATA?').strip()
+        # a long reply can take more than one read of the serial buffer
+        while (reply.count(',') < self._k2_points - 1 or
+               reply.endswith(',')):
+            more = self._k2_enter()
+            if not more:
+                if time.perf_counter() - t0 > self._k2_timeout:
+                    break
+                time.sleep(poll_interval)
+            reply += more
+        data = np.full(self._k2_points, np.nan)
+        if reply:
+            values = np.array(reply.rstrip(',').split(','), dtype=float)
+            data[:len(values)] = values[:self._k2_points]
+        return data
+
+
+class Keithley_6221(Keithley6221Base, VisaInstrument):
+    """
+    Instrument Driver for Keithley 6221 current source, over GPIB or over
+    LAN (with a TCPIP::<ip address>::1394::SOCKET address)
+    """
+    def __init__(self, name: str, address: str, reset: bool=False, **kwargs):
+        """
+        Args:
+            name: Name to use internally in QCoDeS
+            address: VISA ressource address
+            reset: Set Keithley to defaults? True or False
+        """
+        super().__init__(name, address, terminator='\n', **kwargs)
+        self._add_6221_parameters()
+        # Read the buffer as binary doubles. Set to False to read it as
+        # ASCII (done automatically if a binary read fails)
+        self.binary_trace = True
+
+        if reset:
+            self.reset()
+
+        self.connect_message()
+
+    def _read_status_byte(self):
+        """ The status byte, with a serial poll (which doesn't disturb a
+        running sweep) where the interface has one """
+        try:
+            return self.visa_handle.read_stb()
+        except (VisaIOError, NotImplementedError):
+            return int(self.ask('*STB?'))
+
+    def _read_trace_binary(self, query):
+        self.write('FORM:ELEM READ,TST;:FORM:BORD SWAP;:FORM:DATA REAL,64')
+        try:
+            data = self.visa_handle.query_binary_values(
+                query, datatype='d', is_big_endian=False,
+                container=np.array)
+        except VisaIOError:
+            self.device_clear()
+            raise
+        finally:
+            self.write('FORM:DATA ASC')
+            # which leaves the format as read_trace needs it for ASCII
+            self._trace_ascii_format = True
+        return np.ascontiguousarray(data).view(TRACE_DTYPE)
@@ -6,36 +6,36 @@ Created on Fri Jan 19 13:32:00 2018
 @author: robertpolski
 """
 
-import numpy as np
-from typing import Union
+import logging
+import threading
+import time
 
 from qcodes import Instrument
-from qcodes.instrument.parameter import ArrayParameter, MultiParameter
-import qcodes.utils.validators as vals
-import time
-from functools import partial
 import serial
 from qcodes.utils.helpers import strip_attrs
 
-boolcheck = (0, 1, 'on', 'off', 'ON', 'OFF', False, True)
+from qcodes.instrument_drivers.nplab_drivers.Keithley_6221 import (
+    Keithley6221Base)
 
+log = logging.getLogger(__name__)
 
-def parse_output_bool(value):
-    if int(value) == 1 or int(value) == 0:
-        return int(value)
-    elif value is True or value is False:
-        return int(value)
-    elif value == 'on' or value == 'ON':
-        return 1
-    elif value == 'off' or value == 'OFF':
-        return 0
-    else:
-        raise ValueError('Must be boolean, 0 or 1, True or False')
 
-class Keithley_6221_rs232(Instrument):
+class Keithley_6221_rs232(Keithley6221Base, Instrument):
     """
     We made this since we don't have GPIB cables that reach out to the magnet. So the RS-232-usb cable
     can reach, although you need to make sure to have the null-modem adapter on it.
+
+    It has the same parameters and functions as the GPIB Keithley_6221 (see
+    Keithley6221Base). The delta, differential conductance and k2_*
+    functions need the 2182a on the 6221's RS-232 port though, which this
+    connection takes up. For those without GPIB, connect the 6221 by LAN and
+    use Keithley_6221 with the address TCPIP::<ip address>::1394::SOCKET.
+
+    Replies are framed by the terminator: partial replies are kept until the
+    rest arrives. start_query() and read_line(timeout=0) allow reading a
+    reply without blocking. A query that gets no reply within the timeout
+    returns '' (as the readline of the serial port did), with a warning in
+    the log.
     """
 
     def __init__(self, name: str, address: str, timeout=8, **kwargs):
@@ -43,144 +43,27 @@ class Keithley_6221_rs232(Instrument):
         Args:
             name: Name to use internally in QCoDeS
             address: VISA ressource address COM4 is the currently connected usb port)
-            timeout: for the serial communication
+            timeout: for the serial communication (None waits forever)
         """
         super().__init__(name, **kwargs)
 
         self.address = address
         self.terminator = '\n'
+        self._rx = bytearray()
+        self._io_lock = threading.RLock()
         self._open_serial_connection(timeout)
 
-        self._ac_init = False
-        self._ac_ampl = False
-        self._ac_freq = False
-
-        self.add_parameter('current',
-                           label='Current',
-                           get_cmd='SOUR:CURR?',
-                           set_cmd='SOUR:CURR {}',
-                           get_parser=float,
-                           unit='A',
-                           vals=vals.Numbers(-105e-3, 105e-3))
-        self.add_parameter('output',
-                           get_cmd='OUTP:STAT?',
-                           set_cmd='OUTP:STAT {}',
-                           get_parser=int,
-                           set_parser=parse_output_bool,
-                           vals=vals.Enum(*boolcheck))
-        self.add_parameter('range',
-                           get_cmd='CURR:RANG?',
-                           set_cmd='CURR:RANG {}',
-                           get_parser=float,
-                           unit='A',
-                           vals=vals.Numbers(-105e-3, 105e-3))
-        self.add_parameter('auto_range',
-                           get_cmd='CURR:RANG:AUTO?',
-                           set_cmd='CURR:RANG:AUTO {}',
-                           get_parser=int,
-                           set_parser=parse_output_bool,
-                           vals=vals.Enum(*boolcheck))
-        self.add_parameter('compliance',
-                           get_cmd='CURR:COMP?',
-                           set_cmd='CURR:COMP {}',
-                           unit='V',
-                           get_parser=float,
-                           vals=vals.Numbers(-.1, 105))
-        self.add_parameter('delay',
-                           unit='s',
-                           get_cmd='SOUR:DEL?',
-                           set_cmd='SOUR:DEL {}',
-                           get_parser=float,
-                           vals=vals.Numbers(0.001, 999999.999))
-        self.add_parameter('filter',
-                           get_cmd='CURR:FILT?',
-                           set_cmd='CURR:FILT {}',
-                           get_parser=int,
-                           set_parser=parse_output_bool,
-                           vals=vals.Enum(*boolcheck))
-        self.add_parameter('speed',
-                           get_cmd='OUTP:RESP?',
-                           set_cmd='OUTP:RESP {}',
-                           get_parser=str,
-                           vals=vals.Enum('slow', 'fast', 'SLOW', 'FAST'))
-        self.add_parameter('display',
-                           snapshot_get=False,
-                           get_cmd='DISP:ENAB?',
-                           set_cmd='DISP:ENAB {}',
-                           get_parser=int,
-                           set_parser=parse_output_bool,
-                           vals=vals.Enum(*boolcheck))
-        self.add_parameter('beeper',
-                           snapshot_get=False,
-                           get_cmd='SYST:BEEP?',
-                           set_cmd='SYST:BEEP {}',
-                           get_parser=int,
-                           set_parser=parse_output_bool,
-                           vals=vals.Enum(*boolcheck))
-
-        self.add_parameter('AC_amplitude',
-                           get_cmd='SOUR:WAVE:AMPL?',
-                           set_cmd=self._setac_amplitude,
-                           get_parser=float,
-                           unit='A',
-                           vals=vals.Numbers(2e-12, 0.105))
-        self.add_parameter('AC_frequency',
-                           get_cmd='SOUR:WAVE:FREQ?',
-                           set_cmd=self._setac_frequency,
-                           get_parser=float,
-                           unit='Hz',
-                           vals=vals.Numbers(0, 1e5))
-        self.add_parameter('AC_offset',
-                           get_cmd='SOUR:WAVE:OFFS?',
-                           set_cmd='SOUR:WAVE:OFFS {}',
-                           get_parser=float,
-                           unit='A',
-                           vals=vals.Numbers(-0.105, 0.105))
-        self.add_parameter('AC_duration_time',
-                           get_cmd='SOUR:WAVE:DUR:TIME?',
-                           set_cmd='SOUR:WAVE:DUR:TIME {}',
-                           get_parser=float,
-                           unit='s',
-                           vals=vals.MultiType(vals.Enum('INF'),
-                                               vals.Numbers(100e-9,
-                                                            999999.999)))
-        self.add_parameter('AC_duration_cycles',
-                           get_cmd='SOUR:WAVE:DUR:CYCL?',
-                           set_cmd='SOUR:WAVE:DUR:CYCL {}',
-                           get_parser=float,
-                           unit='cycles',
-                           vals=vals.MultiType(vals.Enum('INF'),
-                                               vals.Numbers(0.001,
-                                                            99999999900)))
-        self.add_parameter('AC_phasemark',
-                           get_cmd='SOUR:WAVE:PMAR:STAT?',
-                           set_cmd='SOUR:WAVE:PMAR:STAT {}',
-                           get_parser=int,
-                           set_parser=parse_output_bool,
-                           vals=vals.Enum(*boolcheck))
-        self.add_parameter('AC_phasemark_offset',
-                           get_cmd='SOUR:WAVE:PMAR?',
-                           set_cmd='SOUR:WAVE:PMAR {}',
-                           get_parser=float,
-                           unit='degrees',
-                           vals=vals.Numbers(0, 360))
-        self.add_parameter('AC_ranging',
-                           get_cmd='SOUR:WAVE:RANG?',
-                           set_cmd='SOUR:WAVE:RANG {}',
-                           get_parser=str,
-                           vals=vals.Enum('BEST', 'best', 'FIX', 'fix',
-                                          'FIXED', 'fixed'))
+        self._add_6221_parameters()
 
         self.connect_message()
 
     def _open_serial_connection(self, timeout=None):
-        if timeout is None:
-            ser = serial.Serial(self.address, 115200, rtscts=True)
-        else:
-            ser = serial.Serial(self.address, 115200, timeout=timeout, rtscts=True)
+        # the timeout of the port is set for each read (see read_line)
+        ser = serial.Serial(self.address, 115200, rtscts=True)
         if not (ser.isOpen()):
             ser.open()
         self._ser = ser
+        self._timeout = timeout
 
     def close(self):
         """Irreversibly stop this instrument and free its resources.
@@ -193,54 +76,50 @@ class Keithley_6221_rs232(Instrument):
         strip_attrs(self, whitelist=['name'])
         self.remove_instance(self)
 
-    def reset(self):
-        self._ser.write('*RST'+self.terminator)
-
     def ask_raw(self, cmd):
-        cmd += self.terminator
-        self._ser.write(cmd.encode('utf-8'))
-        time.sleep(0.01)
-        ans = self._ser.readline().decode('utf-8').strip()
+        with self._io_lock:
+            self.start_query(cmd)
+            ans = self.read_line(self._timeout)
+        if ans is None:
+            log.warning('{}: no reply to {} within {} s'.format(
+                self.name, cmd, self._timeout))
+            return ''
         return ans
 
     def write_raw(self, cmd):
         cmd += self.terminator
-        self._ser.write(cmd.encode('utf-8'))
-
-    def _setac_amplitude(self, amp):
-        """This is just the helper function for the AC_amplitude parameter"""
-        if self._ac_freq is False:
-            print('Must enter frequency')
-        if self._ac_init is False:
-            self.write('SOUR:WAVE:FUNC SIN')
-            self.write('SOUR:WAVE:AMPL {}'.format(amp))
-        else:
-            self.write('SOUR:WAVE:AMPL {}'.format(amp))
-        self._ac_ampl = True
-
-    def _setac_frequency(self, freq):
-        """This is just the helper function for the AC_frequency parameter"""
-        if self._ac_ampl is False:
-            print('Must enter amplitude')
-        if self._ac_init is False:
-            self.write('SOUR:WAVE:FUNC SIN')
-            self.write('SOUR:WAVE:FREQ {}'.format(freq))
-        else:
-            self.write('SOUR:WAVE:FREQ {}'.format(freq))
-        self._ac_freq = True
-
-    def AC_init(self):
-        if self._ac_freq is False:
-            print('Must enter frequency')
-        if self._ac_ampl is False:
-            print('Must enter amplitude')
-        self.write('SOUR:WAVE:ARM')
-        self.write('SOUR:WAVE:INIT')
-        self._ac_init = True
-
-    def abort_AC(self):
-        if self._ac_init is False:
-            print('Already aborted')
-        else:
-            self.write('SOUR:WAVE:ABOR')
-            self._ac_init = False
\ No newline at end of file
+        with self._io_lock:
+            self._ser.write(cmd.encode('utf-8'))
+
+    def start_query(self, cmd):
+        """ Sends a query without waiting for the reply; get it with
+        read_line. Replies that are still pending (from a query that timed
+        out) are dropped first, so they can't be taken for this one """
+        with self._io_lock:
+            self._rx.clear()
+            self._ser.reset_input_buffer()
+            self.write_raw(cmd)
+
+    def read_line(self, timeout=0):
+        """ Returns the next complete reply (without the terminator), waiting
+        at most timeout seconds for it (None waits forever, 0 only takes what
+        has already arrived). Returns None if it hasn't arrived by then """
+        terminator = self.terminator.encode('utf-8')
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._io_lock:
+            while True:
+                end = self._rx.find(terminator)
+                if end >= 0:
+                    line = bytes(self._rx[:end])
+                    del self._rx[:end + len(terminator)]
+                    return line.decode('utf-8').strip()
+                waiting = self._ser.in_waiting
+                if deadline is None:
+                    self._ser.timeout = None
+                else:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0 and not waiting:
+                        return None
+                    self._ser.timeout = max(remaining, 0)
+                # blocks until at least a byte arrives (or the timeout)
+                self._rx += self._ser.read(max(waiting, 1))
@@ -4,6 +4,8 @@ from functools import partial
 import time
 import numpy as np
 
+from qcodes.instrument_drivers.nplab_drivers.retry import RetryPolicy
+
 
 def R_parser(string_out):
     newstrs = string_out.strip().split(' ')
@@ -56,10 +58,25 @@ class LR_700(VisaInstrument):
 
     exc_pct: selects a value for the percent of the full excitation to output
     exc_pct_on: 0 sets to 100 pct excitation. 1 sets to the exc_pct value
+
+    range, excitation, exc_pct, dfilter and x10mode all come from the 'Get 6'
+    reply, which is read once and used for all of them for get6_valid_time
+    seconds (or until something is written to the bridge), so a snapshot or
+    loop point only sends it once.
     """
+    get6_params = ('range', 'excitation', 'exc_pct', 'dfilter', 'x10mode')
+
     def __init__(self, name: str, address: str, **kwargs):
         super().__init__(name, address, terminator='\n', **kwargs)
 
+        # the bridge sometimes answers with an empty string: ask again with
+        # backoff for up to 2 s, then give up ('', so the parsers give nan)
+        self.retry_policy = RetryPolicy(name, deadline=2.0, fallback='')
+        # parsed 'Get 6' reply and when it was read (see get6_values)
+        self._get6 = None
+        self._get6_time = 0
+        self.get6_valid_time = 1.0
+
         self.range_vals = {2e-3: 0, 20e-3: 1, 200e-3: 2, 2: 3,
                            20: 4, 200: 5, 2e3: 6, 20e3: 7, 200e3: 8,
                            2e6: 9, np.nan: np.nan}
@@ -79,23 +96,20 @@ class LR_700(VisaInstrument):
         self.add_parameter('range',
                            set_cmd='Range {}',
                            val_mapping=self.range_vals,
-                           get_cmd=partial(self.get_string_repeat, 'Get 6'),
-                           get_parser=partial(self.get6parser, 'range'),
+                           get_cmd=partial(self.get6_value, 'range'),
                            unit='Ohms')
         self.add_parameter('autorange',
                            set_cmd='Autorange {}',
                            vals=vals.Ints(0, 1))
         self.add_parameter('excitation',
                            set_cmd='Excitation {}',
-                           get_cmd=partial(self.get_string_repeat, 'Get 6'),
-                           get_parser=partial(self.get6parser, 'excitation'),
+                           get_cmd=partial(self.get6_value, 'excitation'),
                            val_mapping=self.excitation_vals,
                            unit='V')
         self.add_parameter('exc_pct',
                            set_cmd='Varexc ={}',
                            set_parser=partial(zfill_parser, 2),
-                           get_cmd=partial(self.get_string_repeat, 'Get 6'),
-                           get_parser=partial(self.get6parser, 'exc_pct'),
+                           get_cmd=partial(self.get6_value, 'exc_pct'),
                            vals=vals.Ints(5, 99))
         self.add_parameter('exc_pct_on',
                            set_cmd='Varexc {}',
@@ -116,13 +130,11 @@ class LR_700(VisaInstrument):
                            get_parser=R_parser)
         self.add_parameter('x10mode',
                            set_cmd='Mode {}',
-                           get_cmd=partial(self.get_string_repeat, 'Get 6'),
-                           get_parser=partial(self.get6parser, 'x10mode'),
+                           get_cmd=partial(self.get6_value, 'x10mode'),
                            vals=vals.Ints(0, 1))
         self.add_parameter('dfilter',
                            set_cmd=self.dfilter_set,
-                           get_cmd=partial(self.get_string_repeat, 'Get 6'),
-                           get_parser=partial(self.get6parser, 'dfilter'),
+                           get_cmd=partial(self.get6_value, 'dfilter'),
                            val_mapping=self.dfilter_vals,
                            unit='s')
         self.add_parameter('afilter',
@@ -149,30 +161,41 @@ class LR_700(VisaInstrument):
                            vals=vals.MultiType(vals.Numbers(-99.9995, 99.9995),
                                                vals.Enum('R', 'X')))
 
+    def write_raw(self, cmd):
+        # any setting may change the Get 6 reply
+        self._get6 = None
+        super().write_raw(cmd)
+
+    def get6_values(self):
+        """ Returns the values of range, excitation, exc_pct, dfilter and
+        x10mode (as the instrument codes, before the val_mapping) from one
+        'Get 6' query, as a dict. The parsed reply is reused for
+        get6_valid_time seconds, unless something was written to the bridge
+        in the meantime """
+        if (self._get6 is not None and
+                time.perf_counter() - self._get6_time < self.get6_valid_time):
+            return self._get6
+        string_out = self.get_string_repeat('Get 6')
+        values = {param: self.get6parser(param, string_out)
+                  for param in self.get6_params}
+        if string_out != '':
+            self._get6 = values
+            self._get6_time = time.perf_counter()
+        return values
+
+    def get6_value(self, param):
+        return self.get6_values()[param]
+
     def dfilter_set(self, val):
         self.write('Filter 3')
         self.write('Filter ={}'.format(val))
 
     def get_string_repeat(self, getstring):
-        """ Since sometimes the value of the returned string is '', repeat up
-        to 40 times every quarter of a second"""
-        string_out = self.ask(getstring)
-        if string_out == '':  # Sometimes the instrument returns nothing
-            not_ready = True
-        else:
-            not_ready = False
-            return string_out
-        count = 0
-        while not_ready:
-            time.sleep(0.25)
-            string_out = self.ask(getstring)
-            if string_out != '':
-                not_ready = False
-            elif count >= 40:
-                not_ready = False
-                print('Get command "' + getstring+'" timed out')
-            count += 1
-        return string_out
+        """ Since sometimes the value of the returned string is '', ask again
+        as set by retry_policy (backoff up to its deadline). Returns '' if
+        there's still no answer"""
+        return self.retry_policy.call(self.ask, getstring,
+                                      retry_if=lambda s: s == '')
 
     def get6parser(self, param, string_out):
         """Converts the string with all possible values of param into the
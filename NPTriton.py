@@ -4,8 +4,14 @@ some variations and restrictions specifically applicable to our Triton.
 This has an extra magnetic field sweep protection that disallows sweeping when
 the temperature is too high"""
 
+import asyncio
 import configparser
 import re
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from concurrent.futures import wait as futures_wait
+from collections import namedtuple
 from functools import partial
 import logging
 from traceback import format_exc
@@ -13,9 +19,10 @@ from traceback import format_exc
 from qcodes import IPInstrument
 from qcodes.utils.validators import Enum, Ints, Numbers
 
-from time import sleep
 import numpy as np
 
+from qcodes.instrument_drivers.nplab_drivers.waiting import wait_until
+
 
 def parse_outp_bool(value):
     if type(value) is float:
@@ -49,6 +56,160 @@ def parse_inp_bool(value):
 
 boolcheck = (0, 1, 'on', 'off', 'ON', 'OFF', False, True)
 
+# A reply to a READ command, e.g. STAT:DEV:T8:TEMP:SIG:TEMP:0.0123K or
+# STAT:SYS:VRM:VECT:[0.0000T 0.0000T 1.0000T]: the device (T8, or None for
+# SYS replies), the signal path (TEMP:SIG:TEMP, SYS:VRM:VECT), and the value
+# after the last colon, split into a number and its unit if it is one
+_REPLY_RE = re.compile(
+    r'STAT:(?:DEV:(?P<device>[^:]+):)?(?P<signal>.*):'
+    r'(?:(?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)'
+    r'(?P<unit>[^\d\s:]*)|(?P<text>[^:]*))$')
+_VECTOR_ITEM_RE = re.compile(
+    r'(?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)'
+    r'(?P<unit>[^\d\s]*)$')
+
+TritonReply = namedtuple('TritonReply', ('device', 'signal', 'value',
+                                         'unit'))
+
+
+def parse_reply(msg):
+    """ Parses a Triton reply in one pass into a TritonReply (device, signal,
+    value, unit). The value is a float for numbers, a list for vectors
+    ([...], floats if they are all numbers), None for NOT_FOUND and the text
+    otherwise. unit is '' if there is none """
+    match = _REPLY_RE.match(msg.strip())
+    if match is None:
+        return TritonReply(None, None, msg, '')
+    device, signal, number, unit, text = match.group(
+        'device', 'signal', 'number', 'unit', 'text')
+    if number is not None:
+        return TritonReply(device, signal, float(number), unit)
+    if text == 'NOT_FOUND':
+        return TritonReply(device, signal, None, '')
+    if text.startswith('[') and text.endswith(']'):
+        items = text[1:-1].split()
+        matches = [_VECTOR_ITEM_RE.match(item) for item in items]
+        if matches and all(matches):
+            return TritonReply(device, signal,
+                               [float(m.group('number')) for m in matches],
+                               matches[0].group('unit'))
+        return TritonReply(device, signal, items, '')
+    return TritonReply(device, signal, text, '')
+
+
+class FieldRamp:
+    """ A field sweep started with Triton.field_ramp. One background thread
+    reads the field and magnet status (in one round trip) every
+    poll_interval seconds until the magnet is IDLE again. The samples
+    (time in s from the start, B in T, status) are collected in samples and
+    can be followed with stream(). It's used like a
+    concurrent.futures.Future, and can be awaited in a coroutine:
+
+        ramp = triton.field_ramp(2)
+        for t, B, status in ramp.stream():
+            print(B, lockin865.X())
+        ramp.wait()     # or: await ramp
+
+    result() is the field at the end. cancel() stops the sweep where it is
+    (magnet_hold).
+    """
+    def __init__(self, instrument, target, expected, poll_interval, timeout):
+        self._instrument = instrument
+        self.target = target
+        self.expected = expected
+        self.poll_interval = poll_interval
+        self.samples = []
+        self._cancelled = False
+        self._future = Future()
+        self._new_sample = threading.Condition()
+        self._t0 = time.perf_counter()
+        self._deadline = self._t0 + timeout
+        self._thread = threading.Thread(
+            target=self._poll, daemon=True,
+            name='{}_field_ramp'.format(instrument.name))
+        self._thread.start()
+
+    def _poll(self):
+        busy_seen = False
+        try:
+            while True:
+                B, status = self._instrument._read_field_status()
+                t = time.perf_counter() - self._t0
+                with self._new_sample:
+                    self.samples.append((t, B, status))
+                    self._new_sample.notify_all()
+                if self._cancelled:
+                    self._future.set_exception(CancelledError())
+                    break
+                # right after the start the status can still be IDLE
+                if status != 'IDLE':
+                    busy_seen = True
+                elif busy_seen or abs(B - self.target) < 1e-4 or \
+                        t > self.expected + 10:
+                    self._future.set_result(B)
+                    break
+                if time.perf_counter() >= self._deadline:
+                    self._future.set_exception(TimeoutError(
+                        '{} field sweep not complete after {:.0f} s'.format(
+                            self._instrument.name, t)))
+                    break
+                time.sleep(self.poll_interval)
+        except Exception as e:
+            self._future.set_exception(e)
+        with self._new_sample:
+            self._new_sample.notify_all()
+
+    @property
+    def latest(self):
+        """ The last (time, B, status) sample, or None """
+        return self.samples[-1] if self.samples else None
+
+    def done(self):
+        """ True once the sweep completed, failed or was cancelled """
+        return self._future.done()
+
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        """ Stops the sweep at the present field (magnet_hold). Returns False
+        if it had already completed """
+        if self.done():
+            return self._cancelled
+        self._cancelled = True
+        self._instrument.magnet_hold()
+        return True
+
+    def wait(self, timeout=None):
+        """ Waits for the sweep to end, for at most timeout seconds. Returns
+        True if it completed (not cancelled or failed) """
+        futures_wait([self._future], timeout)
+        return self.done() and self._future.exception() is None
+
+    def result(self, timeout=None):
+        """ Waits for the sweep (see wait) and returns the field at the end.
+        Raises CancelledError if it was cancelled, TimeoutError at the
+        deadline """
+        return self._future.result(timeout)
+
+    def stream(self):
+        """ Yields the (time, B, status) samples as they come in, from the
+        start of the sweep until it ends """
+        i = 0
+        while True:
+            with self._new_sample:
+                while i >= len(self.samples) and not self.done():
+                    self._new_sample.wait()
+                new = self.samples[i:]
+                finished = self.done()
+            i += len(new)
+            yield from new
+            if finished and i >= len(self.samples):
+                return
+
+    def __await__(self):
+        return asyncio.wrap_future(self._future).__await__()
+
 
 class Triton(IPInstrument):
     r"""
@@ -71,6 +232,18 @@ class Triton(IPInstrument):
         self._heater_range_curr = [0.316, 1, 3.16, 10, 31.6, 100]
         self._control_channel = 5
         self._first_magnet_use = False
+        # Held for every exchange with the fridge computer, so that a
+        # FieldRamp poller and other queries don't interleave
+        self._io_lock = threading.RLock()
+        # While waiting for the magnet (field_set_stable, magnet_swh), the
+        # status is checked every magnet_poll_interval seconds once the
+        # sweep should be about done, and magnet_wait_callback (if set) is
+        # called at the same interval, e.g. to log the field and temperature
+        self.magnet_poll_interval = 2.0
+        self.magnet_wait_callback = None
+        # parameter name: (READ command, parser) of the parameters that
+        # bulk_read can read together
+        self._read_cmds = {}
 
         self.add_parameter(name='time',
                            label='System Time',
@@ -79,8 +252,7 @@ class Triton(IPInstrument):
 
         self.add_parameter(name='action',
                            label='Current action',
-                           get_cmd='READ:SYS:DR:ACTN',
-                           get_parser=self._parse_action)
+                           get_cmd=self._get_action)
 
         self.add_parameter(name='status',
                            label='Status',
@@ -201,28 +373,28 @@ class Triton(IPInstrument):
                            unit='T/min',
                            get_cmd=partial(self._get_control_B_param, 'RVST:TIME'))
 
-        self.add_parameter(name='MC_heater',
-                           label='Mixing chamber heater power',
-                           unit='uW',
-                           get_cmd='READ:DEV:H1:HTR:SIG:POWR',
-                           set_cmd='SET:DEV:H1:HTR:SIG:POWR:{}',
-                           get_parser=self._parse_htr,
-                           set_parser=float,
-                           vals=Numbers(0, 300000))
-
-        self.add_parameter(name='still_heater',
-                           label='Still heater power',
-                           unit='uW',
-                           get_cmd='READ:DEV:H2:HTR:SIG:POWR',
-                           set_cmd='SET:DEV:H2:HTR:SIG:POWR:{}',
-                           get_parser=self._parse_htr,
-                           set_parser=float,
-                           vals=Numbers(0, 300000))
-
-        self.add_parameter(name='turbo_speed',
-                           unit='Hz',
-                           get_cmd='READ:DEV:TURB1:PUMP:SIG:SPD',
-                           get_parser=self._parse_pump_speed)
+        self._add_read_parameter(name='MC_heater',
+                                 label='Mixing chamber heater power',
+                                 unit='uW',
+                                 get_cmd='READ:DEV:H1:HTR:SIG:POWR',
+                                 set_cmd='SET:DEV:H1:HTR:SIG:POWR:{}',
+                                 get_parser=self._parse_htr,
+                                 set_parser=float,
+                                 vals=Numbers(0, 300000))
+
+        self._add_read_parameter(name='still_heater',
+                                 label='Still heater power',
+                                 unit='uW',
+                                 get_cmd='READ:DEV:H2:HTR:SIG:POWR',
+                                 set_cmd='SET:DEV:H2:HTR:SIG:POWR:{}',
+                                 get_parser=self._parse_htr,
+                                 set_parser=float,
+                                 vals=Numbers(0, 300000))
+
+        self._add_read_parameter(name='turbo_speed',
+                                 unit='Hz',
+                                 get_cmd='READ:DEV:TURB1:PUMP:SIG:SPD',
+                                 get_parser=self._parse_pump_speed)
 
         self.chan_alias = {'MC': 'T8', 'MC_cernox': 'T5', 'still': 'T3',
                            'cold_plate': 'T4', 'magnet': 'T13', 'PT2h': 'T1',
@@ -247,31 +419,106 @@ class Triton(IPInstrument):
     #     else:
     #         print('Warning: set magnet sweep rate in range (0 , 0.205] T/min')
 
+    def _add_read_parameter(self, name, get_cmd, get_parser, **kwargs):
+        """ add_parameter for a parameter that is read with a single READ
+        command, so that bulk_read can read it together with the others """
+        self._read_cmds[name] = (get_cmd, get_parser)
+        self.add_parameter(name=name, get_cmd=get_cmd, get_parser=get_parser,
+                           **kwargs)
+
+    def bulk_read(self, *names, chunk_size=50):
+        """ Reads several parameters at once: their READ commands are sent
+        in one write (per chunk_size commands) and the replies are read back
+        in order, so reading the whole fridge takes about one round trip
+        instead of one per parameter. The cached values of the parameters
+        are updated too, e.g.
+
+            triton.bulk_read('MC_temp', 'still_temp', 'P1', 'V9')
+
+        names: the parameters to read (see bulk_read_names); all of them if
+            none are given
+        Returns: dict of parameter name: value (None if the reply couldn't
+            be parsed)"""
+        if not names:
+            names = tuple(self._read_cmds)
+        unknown = [name for name in names if name not in self._read_cmds]
+        if unknown:
+            raise KeyError('{} can not bulk read {}'.format(
+                self.name, ', '.join(unknown)))
+
+        # named channels share their command with the T channels
+        cmds = list(dict.fromkeys(self._read_cmds[name][0] for name in names))
+        replies = {}
+        for i in range(0, len(cmds), chunk_size):
+            chunk = cmds[i:i + chunk_size]
+            replies.update(zip(chunk, self._ask_many(chunk)))
+
+        values = {}
+        for name in names:
+            cmd, parser = self._read_cmds[name]
+            try:
+                value = parser(replies[cmd])
+            except (ValueError, IndexError):
+                values[name] = None
+                continue
+            values[name] = value
+            param = self.parameters[name]
+            if hasattr(param, 'cache'):
+                param.cache.set(value)
+            else:
+                param._save_val(value)
+        return values
+
+    @property
+    def bulk_read_names(self):
+        """ The parameters bulk_read can read """
+        return tuple(self._read_cmds)
+
+    def _ask_many(self, cmds):
+        """ Sends the commands in one write and returns the replies in the
+        same order """
+        with self._io_lock, self._ensure_connection:
+            self._send(self._terminator.join(cmds))
+            data = ''
+            while data.count('\n') < len(cmds):
+                chunk = self._socket.recv(self._buffer_size)
+                if not chunk:
+                    raise ConnectionError('{}: connection closed during a '
+                                          'bulk read'.format(self.name))
+                data += chunk.decode()
+        return [line.strip() for line in data.split('\n')[:len(cmds)]]
+
     def read_valves(self):
-        for i in range(1, 10):
-            print('V{}:  {}'.format(i, getattr(self, 'V%d' % i)()))
+        names = ['V%d' % i for i in range(1, 10)]
+        values = self.bulk_read(*names)
+        for name in names:
+            print('{}:  {}'.format(name, values[name]))
 
     def read_pumps(self):
-        print('Turbo: {},  speed: {} Hz'.format(self.turbo(), self.turbo_speed()))
-        print('KNF: {}'.format(self.knf()))
-        print('Forepump: {}'.format(self.forepump()))
+        values = self.bulk_read('turbo', 'turbo_speed', 'knf', 'forepump')
+        print('Turbo: {},  speed: {} Hz'.format(values['turbo'],
+                                                values['turbo_speed']))
+        print('KNF: {}'.format(values['knf']))
+        print('Forepump: {}'.format(values['forepump']))
 
     def read_temps(self):
+        values = self.bulk_read(*[i + suffix for i in self.chan_alias
+                                  for suffix in ('_temp', '_temp_enable')])
         for i in self.chan_alias:
             stat = 'off'
-            if getattr(self, i+'_temp_enable')() == 0:
+            if values[i+'_temp_enable'] == 0:
                 stat = 'off'
-            elif getattr(self, i+'_temp_enable')() == 1:
+            elif values[i+'_temp_enable'] == 1:
                 stat = 'on'
             else:
                 print('Temp reading status not determined')
-            print('{} - {}:  {} K'.format(i, stat, getattr(self, self.chan_alias[i])()))
+            print('{} - {}:  {} K'.format(i, stat, values[i+'_temp']))
 
     def read_pressures(self):
-        for i in range(1,6):
-            print('P{}:  {}'.format(i, getattr(self, 'P'+str(i))()))
-
-        print('POVC:  {}'.format(getattr(self, 'POVC')()))
+        names = ['P%d' % i for i in range(1, 6)] + ['POVC']
+        values = self.bulk_read(*names)
+        for name in names:
+            print('{}:  {}'.format(name, values[name]))
 
     def tempdisable_excMC_magnet(self):
         for i in self.chan_alias:
@@ -291,6 +538,16 @@ class Triton(IPInstrument):
         """Stop any sweeps"""
         self.write('SET:SYS:VRM:ACTN:HOLD')
 
+    def wait_magnet_idle(self, expected=0, timeout=None):
+        """ Waits until the magnet status is IDLE, without checking before
+        most of the expected time (s) has passed and then only every
+        magnet_poll_interval seconds (see waiting.wait_until). Returns False
+        if it's still busy after timeout seconds """
+        return wait_until(lambda: self.magnet_status() == 'IDLE',
+                          expected=expected, timeout=timeout,
+                          poll_interval=self.magnet_poll_interval,
+                          callback=self.magnet_wait_callback)
+
     def _get_control_B_param(self, param):
         cmd = 'READ:SYS:VRM:{}'.format(param)
         return self._get_response_value(self.ask(cmd))
@@ -300,31 +557,20 @@ class Triton(IPInstrument):
     #     return self._get_response_value(self.ask(cmd[:-2]) + cmd[-2:])
 
     def _get_field(self):
-        return float(self.ask('READ:SYS:VRM:VECT').split(' ')[-1].strip('T]'))
+        return self._parse_field(self.ask('READ:SYS:VRM:VECT'))
+
+    def _parse_field(self, msg):
+        # the z component of the vector
+        return float(parse_reply(msg).value[-1])
 
     def _get_response(self, msg):
         return msg.split(':')[-1]
 
-    def _get_response_value(self, msg):  #TODO need to correct this to make it more readable and include NPERS and PERS, HOLD, SAFE, etc.
-        msg = self._get_response(msg)
-        if msg.endswith('NOT_FOUND'):
-            return None
-        elif msg.endswith('IDLE'):
-            return 'IDLE'
-        elif msg.endswith('RTOS'):
-            return 'RTOS'
-        # elif msg.endswith('Bx'):
-        #     return float(re.findall(r"[-+]?\d*\.\d+|\d+", msg)[0])
-        # elif msg.endswith('By'):
-        #     return float(re.findall(r"[-+]?\d*\.\d+|\d+", msg)[1])
-        # elif msg.endswith('Bz'):
-        #     return float(re.findall(r"[-+]?\d*\.\d+|\d+", msg)[2])
-        elif len(re.findall(r"[-+]?\d*\.\d+|\d+", msg)) > 1:
-            return [float(re.findall(r"[-+]?\d*\.\d+|\d+", msg)[0]), float(re.findall(r"[-+]?\d*\.\d+|\d+", msg)[1]), float(re.findall(r"[-+]?\d*\.\d+|\d+", msg)[2])]
-        try:
-            return float(re.findall(r"[-+]?\d*\.\d+|\d+", msg)[0])
-        except Exception:
-            return msg
+    def _get_response_value(self, msg):
+        """ The value of a reply (see parse_reply): None for NOT_FOUND, a
+        float, a list of the vector components, or the text (IDLE, RTOS,
+        HOLD, ...) """
+        return parse_reply(msg).value
 
     def get_idn(self):
         """ Return the Instrument Identifier Message """
@@ -402,7 +648,10 @@ class Triton(IPInstrument):
     #     while self.magnet_status() != 'IDLE':
     #         pass
 
-    def _set_field_stable(self, z):
+    def _start_field_sweep(self, z):
+        """ Starts sweeping the field to z (T) at magnet_sweeprate (after
+        asking for confirmation on the first use). Returns the expected
+        sweep time (s), or None if the magnet is not to be used """
         if self._first_magnet_use is False:
             usecheck = input('Are you sure you want to use the magnet? [y/n]: ')
             if usecheck.lower() == 'y':
@@ -410,7 +659,7 @@ class Triton(IPInstrument):
                 pass
             else:
                 print('Magnet will not be used')
-                return
+                return None
 
         ## Turn this off for now. Just be cautious when using the magnet
         # maxtempHon8T = 4.87
@@ -446,120 +695,95 @@ class Triton(IPInstrument):
         s = self.magnet_sweeprate()
         x = 0
         y = 0
+        # expected sweep time in s (the rate is in T/min)
+        expected = 60*abs(z - self.field())/s if s else 0
         self.write('SET:SYS:VRM:COO:CART:RVST:MODE:RATE:RATE:' + str(s) +
                    ':VSET:[' + str(x) + ' ' + str(y) + ' ' + str(z) + ']')
         self.write('SET:SYS:VRM:ACTN:RTOS')
-        # just to give an time estimate, +10s for overhead
-        # t_wait = self.magnet_sweep_time() * 60 + 10
-        # print('Please wait ' + str(t_wait) + ' seconds for the field sweep, ' +
-        #       'plus the time required for operating the switch...')
-        while self.magnet_status() != 'IDLE':
-            pass
+        return expected
 
-    def _set_field_return(self, z):
-        if self._first_magnet_use is False:
-            usecheck = input('Are you sure you want to use the magnet? [y/n]: ')
-            if usecheck.lower() == 'y':
-                self._first_magnet_use = True
-                pass
-            else:
-                print('Magnet will not be used')
-                return
-
-        ## Turn this off for now. Just be cautious when using the magnet
-        # maxtempHon8T = 4.87
-        # maxtempHon0T = 4.6
-        # maxtempHoff8T = 4.7
-        # maxtempHoff0T = 4.3
-        # magtemp = self.magnet_temp()
-        # if self.magnet_swh():
-        #     f = np.abs(self.field())
-        #     if f < 0.4:
-        #         condit_temp = maxtempHon0T + np.sqrt(0.02*f)
-        #     else:
-        #         p4temp = maxtempHon0T + np.sqrt(0.02*0.4)
-        #         sl = (maxtempHon8T - p4temp)/(8-0.4)
-        #         interc = p4temp - sl*0.4
-        #         condit_temp = sl*f + interc
-        # else:
-        #     f = np.abs(self.field())
-        #     if f < 0.4:
-        #         condit_temp = maxtempHoff0T + np.sqrt(0.02*f)
-        #     else:
-        #         p4temp = maxtempHoff0T + np.sqrt(0.02*0.4)
-        #         sl = (maxtempHoff8T - p4temp)/(8-0.4)
-        #         interc = p4temp - sl*0.4
-        #         condit_temp = sl*f + interc
+    def _set_field_stable(self, z):
+        expected = self._start_field_sweep(z)
+        if expected is None:
+            return
+        # the extra 15 min are for operating the switch heater
+        if not self.wait_magnet_idle(expected, timeout=2*expected + 900):
+            print('Magnet sweep timeout')
 
-        # while magtemp >= condit_temp:
-        #     print('The magnet temperature is {:.4f} K. '.format(magtemp) +
-        #           'Waiting for it to drop < {:.4f} K'.format(condit_temp))
-        #     sleep(15)
-        #     magtemp = self.magnet_temp()
+    def _set_field_return(self, z):
+        self._start_field_sweep(z)
+
+    def field_ramp(self, z, poll_interval=1.0, timeout=None):
+        """ Starts sweeping the field to z (T) at magnet_sweeprate and
+        returns a FieldRamp right away, which follows the sweep in the
+        background (see FieldRamp), so other instruments can be measured
+        while the field moves.
+
+        poll_interval: seconds between field/status readings
+        timeout: seconds after which the FieldRamp stops following the sweep
+            and counts as failed (default twice the expected sweep time plus
+            15 min for the switch heater)
+        Returns None if the magnet is not to be used"""
+        expected = self._start_field_sweep(z)
+        if expected is None:
+            return None
+        if timeout is None:
+            timeout = 2*expected + 900
+        return FieldRamp(self, z, expected, poll_interval, timeout)
 
-        s = self.magnet_sweeprate()
-        x = 0
-        y = 0
-        self.write('SET:SYS:VRM:COO:CART:RVST:MODE:RATE:RATE:' + str(s) +
-                   ':VSET:[' + str(x) + ' ' + str(y) + ' ' + str(z) + ']')
-        self.write('SET:SYS:VRM:ACTN:RTOS')
-        # just to give an time estimate, +10s for overhead
-        # t_wait = self.magnet_sweep_time() * 60 + 10
-        # print('Sweep time approximately ' + str(t_wait) + ' seconds')
-        return
+    def _read_field_status(self):
+        """ The field (T) and magnet status, read in one round trip """
+        vect, actn = self._ask_many(['READ:SYS:VRM:VECT', 'READ:SYS:VRM:ACTN'])
+        return self._parse_field(vect), self._get_response_value(actn)
 
     def _set_swh(self, val):
         val = parse_inp_bool(val)
         if val == 'ON':
             self.write('SET:SYS:VRM:ACTN:NPERS')
             print('Wait 5 min for the switch to warm')
-            sleep(10)
-            while self.magnet_status() != 'IDLE':
-                pass
+            self.wait_magnet_idle(10)
         elif val == 'OFF':
             self.write('SET:SYS:VRM:ACTN:PERS')
             print('Wait 5 min for the switch to cool')
-            sleep(10)
-            while self.magnet_status() != 'IDLE':
-                pass
+            self.wait_magnet_idle(10)
         else:
             raise ValueError('Should be a boolean value (ON, OFF)')
 
     def _get_named_temp_channels(self):
         for al in tuple(self.chan_alias):
             chan = self.chan_alias[al]
-            self.add_parameter(name=al+'_temp',
-                               unit='K',
-                               get_cmd='READ:DEV:%s:TEMP:SIG:TEMP' % chan,
-                               get_parser=self._parse_temp)
-            self.add_parameter(name=al+'_temp_enable',
-                               get_cmd='READ:DEV:%s:TEMP:MEAS:ENAB' % chan,
-                               get_parser=self._parse_state,
-                               set_cmd='SET:DEV:%s:TEMP:MEAS:ENAB:{}' % chan,
-                               set_parser=parse_inp_bool,
-                               vals=Enum(*boolcheck))
+            self._add_read_parameter(name=al+'_temp',
+                                     unit='K',
+                                     get_cmd='READ:DEV:%s:TEMP:SIG:TEMP' % chan,
+                                     get_parser=self._parse_temp)
+            self._add_read_parameter(name=al+'_temp_enable',
+                                     get_cmd='READ:DEV:%s:TEMP:MEAS:ENAB' % chan,
+                                     get_parser=self._parse_state,
+                                     set_cmd='SET:DEV:%s:TEMP:MEAS:ENAB:{}' % chan,
+                                     set_parser=parse_inp_bool,
+                                     vals=Enum(*boolcheck))
             if al == 'MC':
-                self.add_parameter(name='MC_Res',
-                                   unit='Ohms',
-                                   get_cmd='READ:DEV:%s:TEMP:SIG:RES' % chan,
-                                   get_parser=self._parse_res)
+                self._add_read_parameter(name='MC_Res',
+                                         unit='Ohms',
+                                         get_cmd='READ:DEV:%s:TEMP:SIG:RES' % chan,
+                                         get_parser=self._parse_res)
 
     def _get_pressure_channels(self):
         self.chan_pressure = []
         for i in range(1, 6):
             chan = 'P%d' % i
             self.chan_pressure.append(chan)
-            self.add_parameter(name=chan,
-                               unit='mbar',
-                               get_cmd='READ:DEV:%s:PRES:SIG:PRES' % chan,
-                               get_parser=self._parse_pres)
+            self._add_read_parameter(name=chan,
+                                     unit='mbar',
+                                     get_cmd='READ:DEV:%s:PRES:SIG:PRES' % chan,
+                                     get_parser=self._parse_pres)
 
         chan = 'P6'
         self.chan_pressure.append('POVC')
-        self.add_parameter(name='POVC',
-                           unit='mbar',
-                           get_cmd='READ:DEV:%s:PRES:SIG:PRES' % chan,
-                           get_parser=self._parse_pres)
+        self._add_read_parameter(name='POVC',
+                                 unit='mbar',
+                                 get_cmd='READ:DEV:%s:PRES:SIG:PRES' % chan,
+                                 get_parser=self._parse_pres)
         self.chan_pressure = set(self.chan_pressure)
 
     def _get_valve_channels(self):
@@ -567,33 +791,33 @@ class Triton(IPInstrument):
         for i in range(1, 10):
             chan = 'V%d' % i
             self.chan_valves.append(chan)
-            self.add_parameter(name=chan,
-                               get_cmd='READ:DEV:%s:VALV:SIG:STATE' % chan,
-                               set_cmd='SET:DEV:%s:VALV:SIG:STATE:{}' % chan,
-                               get_parser=self._parse_valve_state,
-                               vals=Enum('OPEN', 'CLOSE', 'TOGGLE'))
+            self._add_read_parameter(name=chan,
+                                     get_cmd='READ:DEV:%s:VALV:SIG:STATE' % chan,
+                                     set_cmd='SET:DEV:%s:VALV:SIG:STATE:{}' % chan,
+                                     get_parser=self._parse_valve_state,
+                                     vals=Enum('OPEN', 'CLOSE', 'TOGGLE'))
         self.chan_valves = set(self.chan_valves)
 
     def _get_pump_channels(self):
         self.chan_pumps = ['turbo', 'knf', 'forepump']
-        self.add_parameter(name='turbo',
-                           get_cmd='READ:DEV:TURB1:PUMP:SIG:STATE',
-                           set_cmd='SET:DEV:TURB1:PUMP:SIG:STATE:{}',
-                           get_parser=self._parse_state,
-                           set_parser=parse_inp_bool,
-                           vals=Enum(*boolcheck))
-        self.add_parameter(name='knf',
-                           get_cmd='READ:DEV:COMP:PUMP:SIG:STATE',
-                           set_cmd='SET:DEV:COMP:PUMP:SIG:STATE:{}',
-                           get_parser=self._parse_state,
-                           set_parser=parse_inp_bool,
-                           vals=Enum(*boolcheck))
-        self.add_parameter(name='forepump',
-                           get_cmd='READ:DEV:FP:PUMP:SIG:STATE',
-                           set_cmd='SET:DEV:FP:PUMP:SIG:STATE:{}',
-                           get_parser=self._parse_state,
-                           set_parser=parse_inp_bool,
-                           vals=Enum(*boolcheck))
+        self._add_read_parameter(name='turbo',
+                                 get_cmd='READ:DEV:TURB1:PUMP:SIG:STATE',
+                                 set_cmd='SET:DEV:TURB1:PUMP:SIG:STATE:{}',
+                                 get_parser=self._parse_state,
+                                 set_parser=parse_inp_bool,
+                                 vals=Enum(*boolcheck))
+        self._add_read_parameter(name='knf',
+                                 get_cmd='READ:DEV:COMP:PUMP:SIG:STATE',
+                                 set_cmd='SET:DEV:COMP:PUMP:SIG:STATE:{}',
+                                 get_parser=self._parse_state,
+                                 set_parser=parse_inp_bool,
+                                 vals=Enum(*boolcheck))
+        self._add_read_parameter(name='forepump',
+                                 get_cmd='READ:DEV:FP:PUMP:SIG:STATE',
+                                 set_cmd='SET:DEV:FP:PUMP:SIG:STATE:{}',
+                                 get_parser=self._parse_state,
+                                 set_parser=parse_inp_bool,
+                                 vals=Enum(*boolcheck))
         self.chan_pumps = set(self.chan_pumps)
 
     def _get_temp_channels(self):
@@ -601,16 +825,16 @@ class Triton(IPInstrument):
         for i in range(1, 17):
             chan = 'T%d' % i
             self.chan_temps.append(chan)
-            self.add_parameter(name=chan,
-                               unit='K',
-                               get_cmd='READ:DEV:%s:TEMP:SIG:TEMP' % chan,
-                               get_parser=self._parse_temp)
-            self.add_parameter(name=chan+'_enable',
-                               get_cmd='READ:DEV:%s:TEMP:MEAS:ENAB' % chan,
-                               get_parser=self._parse_state,
-                               set_cmd='SET:DEV:%s:TEMP:MEAS:ENAB:{}' % chan,
-                               set_parser=parse_inp_bool,
-                               vals=Enum(*boolcheck))
+            self._add_read_parameter(name=chan,
+                                     unit='K',
+                                     get_cmd='READ:DEV:%s:TEMP:SIG:TEMP' % chan,
+                                     get_parser=self._parse_temp)
+            self._add_read_parameter(name=chan+'_enable',
+                                     get_cmd='READ:DEV:%s:TEMP:MEAS:ENAB' % chan,
+                                     get_parser=self._parse_state,
+                                     set_cmd='SET:DEV:%s:TEMP:MEAS:ENAB:{}' % chan,
+                                     set_parser=parse_inp_bool,
+                                     vals=Enum(*boolcheck))
         self.chan_temps = set(self.chan_temps)
 
     def fullcooldown(self):
@@ -641,15 +865,24 @@ class Triton(IPInstrument):
         "Stops any running automation"
         self.write('SET:SYS:ACTN:STOP')
 
-    def _parse_action(self, msg):
+    def _get_action(self):
+        # the MC temperature tells circulating from idle, so it's read in
+        # the same round trip
+        actn, mc_temp = self._ask_many(['READ:SYS:DR:ACTN',
+                                        self._read_cmds['MC_temp'][0]])
+        return self._parse_action(actn, self._parse_temp(mc_temp))
+
+    def _parse_action(self, msg, mc_temp=None):
         """ Parse message and return action as a string
 
         Args:
             msg (str): message string
+            mc_temp (float): the MC temperature, to tell circulating from
+                idle when there is no action
         Returns
             action (str): string describing the action
         """
-        action = msg[17:]
+        action = parse_reply(msg).value
         if action == 'PCL':
             action = 'Precooling'
         elif action == 'EPCL':
@@ -657,7 +890,7 @@ class Triton(IPInstrument):
         elif action == 'COND':
             action = 'Condensing'
         elif action == 'NONE':
-            if self.MC_temp.get() < 2:
+            if mc_temp is not None and mc_temp < 2:
                 action = 'Circulating'
             else:
                 action = 'Idle'
@@ -673,53 +906,57 @@ class Triton(IPInstrument):
     def _parse_time(self, msg):
         return msg[14:]
 
+    def _parse_number(self, msg):
+        value = parse_reply(msg).value
+        if value is None or isinstance(value, float):
+            return value
+        raise ValueError('Not a number: {}'.format(msg))
+
     def _parse_temp(self, msg):
-        if 'NOT_FOUND' in msg:
-            return None
-        return float(msg.split('SIG:TEMP:')[-1].strip('K'))
+        return self._parse_number(msg)
 
     def _parse_pres(self, msg):
-        if 'NOT_FOUND' in msg:
-            return None
-        return float(msg.split('SIG:PRES:')[-1].strip('mB'))
+        return self._parse_number(msg)
 
     def _parse_state(self, msg):
-        if 'NOT_FOUND' in msg:
+        state = parse_reply(msg).value
+        if state is None:
             return None
-        state = msg.split(':')[-1].strip()
         return parse_outp_bool(state)
 
     def _parse_valve_state(self, msg):
-        if 'NOT_FOUND' in msg:
-            return None
-        state = msg.split(':')[-1].strip()
-        return state
+        return parse_reply(msg).value
 
     def _parse_pump_speed(self, msg):
-        if 'NOT_FOUND' in msg:
-            return None
-        return float(msg.split('SIG:SPD:')[-1].strip('Hz'))
+        return self._parse_number(msg)
 
     def _parse_res(self, msg):
-        if 'NOT_FOUND' in msg:
-            return None
-        return float(msg.split(':')[-1].strip('Ohm'))
+        return self._parse_number(msg)
 
     def _parse_swh(self, msg):
-        if 'NOT_FOUND' in msg:
+        state = parse_reply(msg).value
+        if state is None:
             return None
-        elif msg.split(' ')[-1].strip(']') == 'ON':
+        if isinstance(state, list):
+            state = state[-1]
+        if state == 'ON':
             return 1
-        elif msg.split(' ')[-1].strip(']') == 'OFF':
+        elif state == 'OFF':
             return 0
         else:
             print('unknown switch heater state')
             return msg
 
     def _parse_htr(self, msg):
-        if 'NOT_FOUND' in msg:
-            return None
-        return float(msg.split('SIG:POWR:')[-1].strip('uW'))
+        return self._parse_number(msg)
+
+    def ask_raw(self, cmd):
+        with self._io_lock:
+            return super().ask_raw(cmd)
+
+    def write_raw(self, cmd):
+        with self._io_lock:
+            super().write_raw(cmd)
 
     def _recv(self):
         return super()._recv().rstrip()
@@ -11,10 +11,10 @@ import pythoncom
 
 import numpy as np
 from typing import Union
-import qcodes as qc
 from qcodes import Instrument
 import qcodes.utils.validators as vals
-import time
+
+from qcodes.instrument_drivers.nplab_drivers.waiting import wait_until
 
 
 class QDInstrument:
@@ -194,6 +194,11 @@ class QD(Instrument, QDInstrument):
 
         self.field_rate = 15  # mT/s
         self.temperature_rate = 10  # K/min
+        # seconds between status checks while waiting for a field or
+        # temperature, and a function called at the same interval (e.g. to
+        # log other instruments)
+        self.wait_poll_interval = 1.0
+        self.wait_callback = None
         print('Note this uses mT units for getting and setting fields with' +
               ' field() and field_set_stable(). Just divide Oe by ' +
               '10 to get mT')
@@ -206,24 +211,14 @@ class QD(Instrument, QDInstrument):
         err_init, temp_init, status_init = self.get_temperature()
         temp_init = float(temp_init)
         self.set_temperature(temperature, self.temperature_rate, 0)
-        waiting = True
-        startwaittime = time.time()
+        # in seconds
+        expected = 60*(np.abs(temp_init-temperature)/self.temperature_rate)+1
         timeout = 60*(np.abs(temp_init-temperature)/self.temperature_rate)*2 +\
             240
-        time.sleep(60*(np.abs(temp_init-temperature)/self.temperature_rate)+1)
-        # in seconds
-        while waiting:
-            err, tval, status = self.get_temperature()
-            if slightlyfaster:
-                if status == 5:
-                    break
-            if status == 1:
-                break
-            else:
-                if time.time() - startwaittime > timeout:
-                    waiting = False
-                    print('Temperature timeout')
-            qc.Wait(0.5)
+        stable = (1, 5) if slightlyfaster else (1,)
+        if not self.wait_status(self.get_temperature, stable, expected,
+                                timeout):
+            print('Temperature timeout')
         return
 
     def temperature_set_release(self, temperature: Union[int, float]):
@@ -240,22 +235,23 @@ class QD(Instrument, QDInstrument):
         err_init, bval_init, status_init = self.get_field()
         bval_init = float(bval_init)/10  # convert from Oe to mT
         self.set_field(field*10, self.field_rate*10, 1, 0)  # convert to Oe
-        waiting = True
-        startwaittime = time.time()
-        timeout = (np.abs(bval_init-field))/(self.field_rate)*3 + 120
-        time.sleep((np.abs(bval_init-field))/(self.field_rate)+1)
         # in seconds
-        while waiting:
-            err, bval, status = self.get_field()
-            if status == 4:
-                break
-            else:
-                if time.time() - startwaittime > timeout:
-                    waiting = False
-                    print('Field timeout')
-            time.sleep(0.25)
+        expected = (np.abs(bval_init-field))/(self.field_rate)+1
+        timeout = (np.abs(bval_init-field))/(self.field_rate)*3 + 120
+        if not self.wait_status(self.get_field, (4,), expected, timeout):
+            print('Field timeout')
         return
 
+    def wait_status(self, get_cmd, stable, expected, timeout):
+        """ Waits until the status from get_cmd (get_field or
+        get_temperature) is one of stable, without checking before the
+        expected time (s) is about over and then every wait_poll_interval
+        seconds (see waiting.wait_until). Returns False at the timeout """
+        return wait_until(lambda: get_cmd()[2] in stable,
+                          expected=expected, timeout=timeout,
+                          poll_interval=self.wait_poll_interval,
+                          callback=self.wait_callback, early=1)
+
     def field_set_release(self, field: Union[int, float]):
         """ field: magnetic field in milliTesla.
         Set and don't wait until stable """
@@ -1,4 +1,4 @@
-from qcodes.instrument_drivers.stanford_research.SR86x import SR86x
+from qcodes.instrument_drivers.nplab_drivers.SR86x import SR86x
 
 
 class SR865A(SR86x):
@@ -1,13 +1,22 @@
 import logging
-from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import (Any, Callable, Dict, Iterator, List, Optional, Sequence,
+                    Tuple)
 
 import numpy as np
+from pyvisa.errors import VisaIOError
 
 from qcodes import VisaInstrument
 from qcodes.instrument.channel import ChannelList, InstrumentChannel
-from qcodes.instrument.parameter import ArrayParameter
+from qcodes.instrument.parameter import ArrayParameter, MultiParameter
+from qcodes.utils.delaykeyboardinterrupt import DelayedKeyboardInterrupt
 from qcodes.utils.validators import ComplexNumbers, Enum, Ints, Numbers
 
+from qcodes.instrument_drivers.nplab_drivers.retry import RetryPolicy
+
 log = logging.getLogger(__name__)
 
 
@@ -37,22 +46,41 @@ class SR86xBufferReadout(ArrayParameter):
                                    'buffer of one channel.')
 
         self._capture_data: Optional[np.ndarray] = None
+        self._setpoints_key: Optional[Tuple[int, Optional[float]]] = None
 
-    def prepare_readout(self, capture_data: np.ndarray) -> None:
+    def prepare_readout(self, capture_data: np.ndarray,
+                        capture_rate: Optional[float] = None) -> None:
         """
         Prepare this parameter for readout.
 
         Args:
             capture_data: The data to capture.
+            capture_rate: If given, the setpoints are the sample times in
+                seconds (sample number / capture_rate) instead of the sample
+                numbers.
         """
         self._capture_data = capture_data
 
         data_len = len(capture_data)
         self.shape = (data_len,)
-        self.setpoint_units = ('',)
-        self.setpoint_names = ('sample_nr',)
-        self.setpoint_labels = ('Sample number',)
-        self.setpoints = (tuple(np.arange(0, data_len)),)
+        # The setpoints are kept as an array (not a tuple of python ints,
+        # which costs far more than the float32 data for big captures), and
+        # reused as long as the length and rate don't change
+        if (data_len, capture_rate) != self._setpoints_key:
+            if capture_rate is None:
+                setpoints = np.arange(data_len)
+            else:
+                setpoints = np.arange(data_len) / capture_rate
+            self._setpoints_key = (data_len, capture_rate)
+            self.setpoints = (setpoints,)
+        if capture_rate is None:
+            self.setpoint_units = ('',)
+            self.setpoint_names = ('sample_nr',)
+            self.setpoint_labels = ('Sample number',)
+        else:
+            self.setpoint_units = ('s',)
+            self.setpoint_names = ('Time',)
+            self.setpoint_labels = ('Time',)
 
     def get_raw(self) -> np.ndarray:
         """
@@ -92,6 +120,10 @@ class SR86xBuffer(InstrumentChannel):
         self.max_capture_length_in_kb = 4096  # i.e. maximum buffer size
         # Maximum amount of kB that can be read per single CAPTUREGET command
         self.max_size_per_reading_in_kb = 64
+        # Bounds on the time between "CAPTUREBYTES?" polls while waiting for
+        # a capture, in seconds
+        self.min_poll_interval = 0.01
+        self.max_poll_interval = 0.5
 
         self.add_parameter(  # Configure which parameters we want to capture
             "capture_config",
@@ -278,14 +310,16 @@ class SR86xBuffer(InstrumentChannel):
         n_variables = len(capture_variables)
         return n_variables
 
-    def _calc_capture_size_in_kb(self, sample_count: int) -> int:
+    def _calc_capture_size_in_kb(self, sample_count: int,
+                                 n_variables: Optional[int] = None) -> int:
         """
         Given the number of samples to capture, calculate the capture length
         that the buffer needs to be set to in order to fit the requested
         number of samples. Note that the number of activated readouts is
-        taken into account.
+        taken into account; it is queried unless n_variables is given.
         """
-        n_variables = self._get_number_of_capture_variables()
+        if n_variables is None:
+            n_variables = self._get_number_of_capture_variables()
         total_size_in_kb = int(
             np.ceil(n_variables * sample_count * self.bytes_per_sample / 1024)
         )
@@ -306,27 +340,81 @@ class SR86xBuffer(InstrumentChannel):
         total_size_in_kb = self._calc_capture_size_in_kb(sample_count)
         self.capture_length_in_kb(total_size_in_kb)
 
-    def wait_until_samples_captured(self, sample_count: int) -> None:
+    def wait_until_samples_captured(
+            self,
+            sample_count: int,
+            timeout: Optional[float] = None,
+            cancel: Optional[threading.Event] = None,
+            sample_rate: Optional[float] = None
+    ) -> int:
         """
-        Wait until the given number of samples is captured. This function
-        is blocking and has to be used with caution because it does not have
-        a timeout.
+        Wait until the given number of samples is captured, without keeping
+        the bus busy: sleep for the time the remaining samples are expected
+        to take, then check "CAPTUREBYTES?" and sleep again for the (now
+        shorter) expected remainder, never less than `min_poll_interval`.
+        If the rate is unknown, the polls start at `min_poll_interval` and
+        back off up to `max_poll_interval`.
 
         Args:
             sample_count: Number of samples that needs to be captured
+            timeout: Seconds to wait at most; a TimeoutError is raised when
+                the deadline passes. None waits indefinitely.
+            cancel: An event that, when set (e.g. from another thread),
+                stops the wait early
+            sample_rate: Expected samples per second. Defaults to the
+                capture rate; pass the trigger rate when capturing one sample
+                per trigger, or 0 if it is not known.
+
+        Returns:
+            The number of samples captured so far (less than sample_count
+            only if the wait was cancelled)
         """
-        n_captured_bytes = 0
+        deadline = None if timeout is None else time.monotonic() + timeout
         n_variables = self._get_number_of_capture_variables()
-        n_bytes_to_capture = sample_count * n_variables * self.bytes_per_sample
-        while n_captured_bytes < n_bytes_to_capture:
+        bytes_per_sample = n_variables * self.bytes_per_sample
+        n_bytes_to_capture = sample_count * bytes_per_sample
+        if sample_rate is None:
+            sample_rate = self.capture_rate()
+
+        n_captured_bytes = 0
+        backoff = self.min_poll_interval
+        while True:
+            if sample_rate:
+                wait = ((n_bytes_to_capture - n_captured_bytes)
+                        / bytes_per_sample / sample_rate)
+            else:
+                wait = backoff
+                backoff = min(2 * backoff, self.max_poll_interval)
+            wait = max(wait, self.min_poll_interval)
+            if deadline is not None:
+                time_left = deadline - time.monotonic()
+                if time_left <= 0:
+                    raise TimeoutError(
+                        f"Only {n_captured_bytes // bytes_per_sample} of "
+                        f"{sample_count} samples were captured within "
+                        f"{timeout} s")
+                wait = min(wait, time_left)
+
+            if cancel is None:
+                time.sleep(wait)
+            elif cancel.wait(wait):
+                return self.count_capture_bytes() // bytes_per_sample
+
             n_captured_bytes = self.count_capture_bytes()
+            if n_captured_bytes >= n_bytes_to_capture:
+                return n_captured_bytes // bytes_per_sample
 
-    def get_capture_data(self, sample_count: int) -> Dict[str, np.ndarray]:
+    def get_capture_data(self, sample_count: int,
+                         time_axis: bool = False) -> Dict[str, np.ndarray]:
         """
         Read the given number of samples of the capture data from the buffer.
 
         Args:
             sample_count: number of samples to read from the buffer
+            time_axis: if True, the setpoints of the buffer readout parameters
+                are the sample times in seconds (from the capture rate)
+                rather than the sample numbers. Only meaningful for captures
+                at the capture rate, not one sample per trigger.
 
         Returns:
             The keys in the dictionary correspond to the captured
@@ -335,40 +423,73 @@ class SR86xBuffer(InstrumentChannel):
             be "X" and "Y". The values in the dictionary are numpy arrays
             of numbers.
         """
-        total_size_in_kb = self._calc_capture_size_in_kb(sample_count)
         capture_variables = self._get_list_of_capture_variable_names()
-        n_variables = self._get_number_of_capture_variables()
+        n_variables = len(capture_variables)
+        total_size_in_kb = self._calc_capture_size_in_kb(sample_count,
+                                                         n_variables)
 
         values = self._get_raw_capture_data(total_size_in_kb)
 
-        # Remove zeros which mark the end part of the buffer that is not
-        # filled with captured data
-        values = values[values != 0]
+        # Drop the end part of the buffer that is not filled with (complete
+        # samples of) captured data
+        n_samples = min(sample_count, len(values) // n_variables)
+        values = values[:n_samples * n_variables]
 
         values = values.reshape((-1, n_variables)).T
-        values = values[:, :sample_count]
 
         data = {k: v for k, v in zip(capture_variables, values)}
 
+        capture_rate = self.capture_rate() if time_axis else None
         for capture_variable in capture_variables:
             buffer_parameter = getattr(self, capture_variable)
-            buffer_parameter.prepare_readout(data[capture_variable])
+            buffer_parameter.prepare_readout(data[capture_variable],
+                                             capture_rate)
 
         return data
 
-    def _get_raw_capture_data(self, size_in_kb: int) -> np.ndarray:
+    def iter_capture_data(self, sample_count: int
+                          ) -> Iterator[Dict[str, np.ndarray]]:
         """
-        Read data from the buffer from its beginning avoiding the instrument
-        limit of 64 kilobytes per reading.
+        Read the given number of samples of the capture data from the buffer
+        one block (at most 64 kB, one CAPTUREGET? query) at a time, yielding
+        the samples of each block as soon as it arrives. Use this instead of
+        `get_capture_data` to process or save a large capture piece by piece
+        without holding all of it in memory. The buffer readout parameters
+        are not prepared.
 
         Args:
-            size_in_kb :Size of the data that needs to be read; if it exceeds
-                the capture length, an exception is raised.
+            sample_count: number of samples to read from the buffer
+
+        Yields:
+            Dictionaries like the one returned by `get_capture_data`, with the
+            consecutive samples of one block.
+        """
+        capture_variables = self._get_list_of_capture_variable_names()
+        n_variables = len(capture_variables)
+        total_size_in_kb = self._calc_capture_size_in_kb(sample_count,
+                                                         n_variables)
+
+        samples_left = sample_count
+        for block in self._iter_raw_capture_data(total_size_in_kb):
+            # blocks are a whole number of kB, so they always hold complete
+            # samples
+            n_samples = min(samples_left, len(block) // n_variables)
+            if n_samples <= 0:
+                break
+            block = block[:n_samples * n_variables]
+            block = block.reshape((-1, n_variables)).T
+            samples_left -= n_samples
+            yield {k: v for k, v in zip(capture_variables, block)}
+
+    def _check_capture_size(self, size_in_kb: int) -> int:
+        """
+        Check that size_in_kb of data can be read from the buffer, with one
+        query of the capture length and one of the number of bytes captured
+        so far.
 
         Returns:
-            A one-dimensional numpy array of the requested data. Note that the
-            returned array contains data for all the variables that are
-            mentioned in the capture config.
+            The number of values (4 bytes each) that have been captured so
+            far and can be read from the start of the buffer.
         """
         current_capture_length = self.capture_length_in_kb()
         if size_in_kb > current_capture_length:
@@ -376,27 +497,108 @@ class SR86xBuffer(InstrumentChannel):
                              f"is larger than current capture length of the "
                              f"buffer ({current_capture_length}kB).")
 
-        values = np.array([])
-        data_size_to_read_in_kb = size_in_kb
-        n_readings = 0
+        n_captured_bytes = self.count_capture_bytes()
+        # Size of the data captured so far, in kB, rounded up to 2kB chunks
+        size_of_currently_captured_data = int(
+            np.ceil(np.ceil(n_captured_bytes / 1024) / 2) * 2
+        )
+        if size_in_kb > size_of_currently_captured_data:
+            raise ValueError(f"The size of the requested data ({size_in_kb}kB) "
+                             f"cannot be larger than the size of currently "
+                             f"captured data rounded up to 2kB chunks "
+                             f"({size_of_currently_captured_data}kB)")
 
-        while data_size_to_read_in_kb > 0:
-            offset = n_readings * self.max_size_per_reading_in_kb
+        return n_captured_bytes // self.bytes_per_sample
 
-            if data_size_to_read_in_kb > self.max_size_per_reading_in_kb:
-                size_of_this_reading = self.max_size_per_reading_in_kb
-            else:
-                size_of_this_reading = data_size_to_read_in_kb
+    def _iter_raw_capture_data(self, size_in_kb: int) -> Iterator[np.ndarray]:
+        """
+        Read data from the start of the buffer in blocks of at most 64 kB
+        (the instrument limit per reading), yielding each block as a float32
+        array. The captured size is checked once, before the first block.
+        """
+        n_captured_values = self._check_capture_size(size_in_kb)
+        values_per_kb = 1024 // self.bytes_per_sample
+
+        for offset in range(0, size_in_kb, self.max_size_per_reading_in_kb):
+            size_of_this_reading = min(self.max_size_per_reading_in_kb,
+                                       size_in_kb - offset)
+            block = self._capture_get(size_of_this_reading, offset)
+            n_valid = n_captured_values - offset * values_per_kb
+            yield block[:max(n_valid, 0)]
+            if n_valid <= len(block):
+                break
 
-            data_from_this_reading = self._get_raw_capture_data_block(
-                size_of_this_reading,
-                offset_in_kb=offset)
-            values = np.append(values, data_from_this_reading)
+    def _get_raw_capture_data(self, size_in_kb: int) -> np.ndarray:
+        """
+        Read data from the buffer from its beginning avoiding the instrument
+        limit of 64 kilobytes per reading. The result is preallocated and
+        each reading is written straight into its part of it.
 
-            data_size_to_read_in_kb -= size_of_this_reading
-            n_readings += 1
+        Args:
+            size_in_kb :Size of the data that needs to be read; if it exceeds
+                the capture length, an exception is raised.
 
-        return values
+        Returns:
+            A one-dimensional float32 numpy array of the requested data, with
+            the part of the buffer that has not been captured yet cut off.
+            Note that the returned array contains data for all the variables
+            that are mentioned in the capture config.
+        """
+        n_captured_values = self._check_capture_size(size_in_kb)
+        values_per_kb = 1024 // self.bytes_per_sample
+        values = np.empty(size_in_kb * values_per_kb, dtype=np.float32)
+
+        n_read = 0
+        for offset in range(0, size_in_kb, self.max_size_per_reading_in_kb):
+            size_of_this_reading = min(self.max_size_per_reading_in_kb,
+                                       size_in_kb - offset)
+            start = offset * values_per_kb
+            view = values[start:start + size_of_this_reading * values_per_kb]
+            n_read = start + len(self._capture_get(size_of_this_reading,
+                                                   offset, out=view))
+            if n_read >= n_captured_values:
+                break
+
+        return values[:min(n_read, n_captured_values)]
+
+    def _capture_get(self, size_in_kb: int, offset_in_kb: int,
+                     out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Send one "CAPTUREGET?" query without any checks and return the data
+        as a float32 array. If out is given, the data is written into it and
+        the filled part of out is returned.
+
+        The binary block is read as raw bytes and viewed as float32 without
+        an intermediate array, so with out given the only copy is the one
+        into out. This talks to the VISA handle directly (under io_lock), so
+        it can also be used from a stream reader thread.
+        """
+        visa_handle = self._parent.visa_handle
+        with self._parent.io_lock:
+            visa_handle.write(f"CAPTUREGET? {offset_in_kb}, {size_in_kb}")
+            # IEEE 488.2 block: '#', the number of length digits, the
+            # length and the data. The sr86x does not include an extra
+            # termination char on binary messages.
+            header = visa_handle.read_bytes(2)
+            if header[:1] != b'#':
+                raise ValueError(f"Unexpected CAPTUREGET? reply {header!r}")
+            n_bytes = int(visa_handle.read_bytes(int(header[1:2])))
+            raw = visa_handle.read_bytes(n_bytes)
+        values = np.frombuffer(raw, dtype='<f4')
+        if out is None:
+            return values.copy()
+        n_values = min(len(values), len(out))
+        out[:n_values] = values[:n_values]
+        return out[:n_values]
+
+    def _read_capture_bytes(self) -> int:
+        """
+        "CAPTUREBYTES?" straight from the VISA handle (under io_lock), for
+        the stream reader thread: the parameter goes through ask_raw, whose
+        retries would turn a failure into nan.
+        """
+        with self._parent.io_lock:
+            return int(self._parent.visa_handle.query("CAPTUREBYTES?"))
 
     def _get_raw_capture_data_block(self,
                                     size_in_kb: int,
@@ -452,20 +654,15 @@ class SR86xBuffer(InstrumentChannel):
                              f"2kB chunks "
                              f"({size_of_currently_captured_data}kB)")
 
-        values = self._parent.visa_handle.query_binary_values(
-            f"CAPTUREGET? {offset_in_kb}, {size_in_kb}",
-            datatype='f',
-            is_big_endian=False,
-            expect_termination=False)
-        # the sr86x does not include an extra termination char on binary
-        # messages so we set expect_termination to False
-
-        return np.array(values)
+        return self._capture_get(size_in_kb, offset_in_kb)
 
     def capture_one_sample_per_trigger(
             self,
             trigger_count: int,
-            start_triggers_pulsetrain: Callable[..., Any]
+            start_triggers_pulsetrain: Callable[..., Any],
+            timeout: Optional[float] = None,
+            cancel: Optional[threading.Event] = None,
+            trigger_rate: float = 0
     ) -> Dict[str, np.ndarray]:
         """
         Capture one sample per each trigger, and return when the specified
@@ -475,6 +672,11 @@ class SR86xBuffer(InstrumentChannel):
             trigger_count: Number of triggers to capture samples for
             start_triggers_pulsetrain: By calling this *non-blocking*
                 function, the train of trigger pulses should start
+            timeout, cancel: see `wait_until_samples_captured`. The capture
+                is stopped on a timeout; after a cancel, the samples
+                captured so far are returned.
+            trigger_rate: expected triggers per second, if known; it sets
+                how long to sleep before checking on the capture
 
         Returns:
             The keys in the dictionary correspond to the captured
@@ -486,14 +688,21 @@ class SR86xBuffer(InstrumentChannel):
         self.set_capture_length_to_fit_samples(trigger_count)
         self.start_capture("ONE", "SAMP")
         start_triggers_pulsetrain()
-        self.wait_until_samples_captured(trigger_count)
-        self.stop_capture()
-        return self.get_capture_data(trigger_count)
-
-    def capture_samples_after_trigger(self,
-                                      sample_count: int,
-                                      send_trigger: Callable[..., Any]
-                                      ) -> Dict[str, np.ndarray]:
+        try:
+            n_captured = self.wait_until_samples_captured(
+                trigger_count, timeout, cancel, sample_rate=trigger_rate)
+        finally:
+            self.stop_capture()
+        return self.get_capture_data(min(n_captured, trigger_count))
+
+    def capture_samples_after_trigger(
+            self,
+            sample_count: int,
+            send_trigger: Callable[..., Any],
+            timeout: Optional[float] = None,
+            cancel: Optional[threading.Event] = None,
+            time_axis: bool = False
+    ) -> Dict[str, np.ndarray]:
         """
         Capture a number of samples after a trigger has been received.
         Please refer to page 135 of the manual for details.
@@ -502,6 +711,8 @@ class SR86xBuffer(InstrumentChannel):
             sample_count: Number of samples to capture
             send_trigger: By calling this *non-blocking* function, one trigger
                 should be sent that will initiate the capture
+            timeout, cancel: see `capture_one_sample_per_trigger`
+            time_axis: see `get_capture_data`
 
         Returns:
             The keys in the dictionary correspond to the captured
@@ -513,11 +724,19 @@ class SR86xBuffer(InstrumentChannel):
         self.set_capture_length_to_fit_samples(sample_count)
         self.start_capture("ONE", "TRIG")
         send_trigger()
-        self.wait_until_samples_captured(sample_count)
-        self.stop_capture()
-        return self.get_capture_data(sample_count)
-
-    def capture_samples(self, sample_count: int) -> Dict[str, np.ndarray]:
+        try:
+            n_captured = self.wait_until_samples_captured(sample_count,
+                                                          timeout, cancel)
+        finally:
+            self.stop_capture()
+        return self.get_capture_data(min(n_captured, sample_count),
+                                     time_axis)
+
+    def capture_samples(self, sample_count: int,
+                        timeout: Optional[float] = None,
+                        cancel: Optional[threading.Event] = None,
+                        time_axis: bool = False
+                        ) -> Dict[str, np.ndarray]:
         """
         Capture a number of samples at a capture rate, starting immediately.
         Unlike the "continuous" capture mode, here the buffer does not get
@@ -528,6 +747,8 @@ class SR86xBuffer(InstrumentChannel):
 
         Args:
             sample_count: Number of samples to capture
+            timeout, cancel: see `capture_one_sample_per_trigger`
+            time_axis: see `get_capture_data`
 
         Returns:
             The keys in the dictionary correspond to the captured
@@ -538,9 +759,182 @@ class SR86xBuffer(InstrumentChannel):
         """
         self.set_capture_length_to_fit_samples(sample_count)
         self.start_capture("ONE", "IMM")
-        self.wait_until_samples_captured(sample_count)
-        self.stop_capture()
-        return self.get_capture_data(sample_count)
+        try:
+            n_captured = self.wait_until_samples_captured(sample_count,
+                                                          timeout, cancel)
+        finally:
+            self.stop_capture()
+        return self.get_capture_data(min(n_captured, sample_count),
+                                     time_axis)
+
+    def start_streaming(self,
+                        capture_length_in_kb: Optional[int] = None,
+                        trigger_mode: str = "IMM",
+                        max_queue_blocks: int = 1000,
+                        sink: Optional[Callable[..., Any]] = None,
+                        poll_interval: Optional[float] = None
+                        ) -> 'SR86xBufferStream':
+        """
+        Start a continuous capture that is read out in the background, for
+        gap-free recording over long times. The capture rate and
+        configuration are the ones currently set; the buffer works as a ring
+        of capture_length_in_kb (by default the maximum, 4096 kB, which gives
+        the reader the most slack).
+
+        Args:
+            capture_length_in_kb: size of the ring buffer on the lock-in
+            trigger_mode: "IMM" | "TRIG" | "SAMP", see `start_capture`
+            max_queue_blocks: size of the host-side queue, in blocks
+            sink: callable that gets every block of samples instead of the
+                queue (e.g. to write it to a file)
+            poll_interval: see `SR86xBufferStream`
+
+        Returns:
+            The running `SR86xBufferStream`; call its `stop` method to end the
+            capture. Other queries to the lock-in can be made meanwhile.
+        """
+        if capture_length_in_kb is None:
+            capture_length_in_kb = self.max_capture_length_in_kb
+        self.capture_length_in_kb(capture_length_in_kb)
+        stream = SR86xBufferStream(self, max_queue_blocks=max_queue_blocks,
+                                   sink=sink, poll_interval=poll_interval)
+        stream.start(trigger_mode)
+        return stream
+
+
+class SR86xBufferStream:
+    """
+    Background reader for a continuous ("CONT") capture. The lock-in writes
+    into its capture buffer as a ring; a thread follows the write pointer
+    (from "CAPTUREBYTES?"), reads only the newly written kilobytes with
+    "CAPTUREGET?" at the right offset (splitting reads at the end of the
+    ring), and hands them over as blocks of samples. Use
+    `SR86xBuffer.start_streaming` to create one.
+
+    Each block is a dictionary like the one returned by
+    `SR86xBuffer.get_capture_data`. Blocks go to `sink` if one is given,
+    otherwise into the bounded queue `blocks` (read it with `get`). If the
+    host falls behind and the queue is full, blocks are dropped and counted
+    in `n_dropped_blocks`; if the lock-in overwrites data before it could be
+    read, the lost bytes are counted in `n_overrun_bytes`.
+
+    Args:
+        buffer: the buffer module of the lock-in
+        max_queue_blocks: size of the host-side queue, in blocks
+        sink: optional callable that gets every block instead of the queue,
+            e.g. to append it to a file
+        poll_interval: time between polls of the write pointer in seconds.
+            By default 1/8 of the time it takes to fill the buffer (at most
+            0.2 s), so that data is read well before it is overwritten.
+    """
+    def __init__(self, buffer: 'SR86xBuffer', max_queue_blocks: int = 1000,
+                 sink: Optional[Callable[[Dict[str, np.ndarray]], Any]] = None,
+                 poll_interval: Optional[float] = None) -> None:
+        self._buffer = buffer
+        self._sink = sink
+        self.blocks: 'queue.Queue[Dict[str, np.ndarray]]' = queue.Queue(
+            maxsize=max_queue_blocks)
+
+        self.capture_variables = buffer._get_list_of_capture_variable_names()
+        self._n_variables = len(self.capture_variables)
+        self._ring_kb = buffer.capture_length_in_kb()
+        self._ring_bytes = self._ring_kb * 1024
+        self.capture_rate = buffer.capture_rate()
+
+        if poll_interval is None:
+            fill_time = self._ring_bytes / (
+                self.capture_rate * self._n_variables * buffer.bytes_per_sample)
+            poll_interval = min(0.2, fill_time / 8)
+        self.poll_interval = poll_interval
+
+        self.n_samples = 0
+        self.n_dropped_blocks = 0
+        self.n_overrun_bytes = 0
+        self.error: Optional[Exception] = None
+
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name=f"{buffer.name}_stream")
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def start(self, trigger_mode: str = "IMM") -> None:
+        """Start the continuous capture and the reader thread"""
+        self._buffer.start_capture("CONT", trigger_mode)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the reader thread (after it has read what was captured so
+        far) and the capture"""
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._buffer.stop_capture()
+
+    def get(self, timeout: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """Take the next block of samples from the queue, waiting up to
+        timeout seconds (raises queue.Empty if none arrives)"""
+        return self.blocks.get(timeout=timeout)
+
+    def _run(self) -> None:
+        last_pointer = 0
+        n_written = 0  # bytes written by the lock-in since the start
+        n_read = 0  # bytes read (or skipped) by us
+        try:
+            while True:
+                stopping = self._stop_event.is_set()
+                pointer = self._buffer._read_capture_bytes() % self._ring_bytes
+                n_written += (pointer - last_pointer) % self._ring_bytes
+                last_pointer = pointer
+
+                unread = n_written - n_read
+                # keep 2 kB clear of the write pointer: that part of the
+                # ring may be overwritten while we read
+                if unread > self._ring_bytes - 2048:
+                    skip = unread - (self._ring_bytes - 2048)
+                    skip += -skip % 1024
+                    n_read += skip
+                    self.n_overrun_bytes += skip
+                    log.warning(f"{self._buffer.name}: the buffer was "
+                                f"overwritten before {skip} bytes could be "
+                                f"read")
+
+                n_read = self._read_available(n_read, n_written)
+
+                if stopping:
+                    break
+                self._stop_event.wait(self.poll_interval)
+        except Exception as e:
+            self.error = e
+            log.exception(f"{self._buffer.name}: stream reader stopped")
+
+    def _read_available(self, n_read: int, n_written: int) -> int:
+        """Read all complete kilobytes between n_read and n_written (both
+        counted from the start of the capture) and return the new n_read"""
+        max_kb = self._buffer.max_size_per_reading_in_kb
+        while n_written - n_read >= 1024:
+            offset_kb = (n_read // 1024) % self._ring_kb
+            size_kb = min((n_written - n_read) // 1024, max_kb,
+                          self._ring_kb - offset_kb)
+            values = self._buffer._capture_get(size_kb, offset_kb)
+            n_read += size_kb * 1024
+            self._deliver(values)
+        return n_read
+
+    def _deliver(self, values: np.ndarray) -> None:
+        # a kB always holds whole samples (4, 8 or 16 bytes each)
+        values = values.reshape((-1, self._n_variables)).T
+        block = {k: v for k, v in zip(self.capture_variables, values)}
+        self.n_samples += values.shape[1]
+        if self._sink is not None:
+            self._sink(block)
+            return
+        try:
+            self.blocks.put_nowait(block)
+        except queue.Full:
+            self.n_dropped_blocks += 1
 
 
 class SR86xDataChannel(InstrumentChannel):
@@ -598,6 +992,223 @@ class SR86xDataChannel(InstrumentChannel):
         return self._color
 
 
+class SR86xSnap(MultiParameter):
+    """
+    Gets several of the quantities measured by the lock-in amplifier (X, Y,
+    R, P, aux inputs, ... see `PARAMETER_NAMES`) with a single query, so that
+    all of them come from the same measurement cycle. 2 or 3 values are read
+    with `SNAP?`; 4 values with `SNAPD?`, after assigning them to the data
+    channels (this changes what the front panel displays).
+
+    Measured in a Loop, every quantity gets its own DataArray with the same
+    array id as the driver parameter that reads it alone (e.g. `lockin865_X`,
+    `lockin865_aux_in0` for Aux In 1), and the cached values of those
+    parameters are updated as well. Use `SR86x.snap` to get one.
+
+    Args:
+        name: parameter name
+        instrument: the SR86x instrument
+        snap_names: 1 to 4 names from `PARAMETER_NAMES`
+    """
+    def __init__(self, name: str, instrument: 'SR86x',
+                 snap_names: Sequence[str], **kwargs: Any) -> None:
+        snap_names = tuple(snap_names)
+        if not 1 <= len(snap_names) <= instrument._N_DATA_CHANNELS:
+            raise KeyError(f'Between 1 and {instrument._N_DATA_CHANNELS} '
+                           f'values can be read at a time, got {snap_names}')
+        for n in snap_names:
+            if n not in instrument.PARAMETER_NAMES:
+                raise KeyError(f'{n} is not a valid parameter name. Refer '
+                               f'to `PARAMETER_NAMES` for a list of valid '
+                               f'parameter names')
+        self.snap_names = snap_names
+        params = [instrument.parameters.get(self.parameter_name(n))
+                  for n in snap_names]
+        super().__init__(name,
+                         names=tuple(self.parameter_name(n) if p is not None
+                                     else n
+                                     for p, n in zip(params, snap_names)),
+                         shapes=((),) * len(snap_names),
+                         labels=tuple(p.label if p is not None else n
+                                      for p, n in zip(params, snap_names)),
+                         units=tuple(p.unit if p is not None else ''
+                                     for p in params),
+                         instrument=instrument,
+                         docstring=f'{", ".join(snap_names)} read in one '
+                                   f'query',
+                         **kwargs)
+
+    @staticmethod
+    def parameter_name(snap_name: str) -> str:
+        """
+        Name of the driver parameter that reads the same quantity as a name
+        in `PARAMETER_NAMES`. The aux channels are numbered from 1 in
+        `PARAMETER_NAMES` but from 0 in the driver parameters (aux_in1 is
+        the parameter aux_in0)
+        """
+        if snap_name.startswith(('aux_in', 'aux_out')):
+            return snap_name[:-1] + str(int(snap_name[-1]) - 1)
+        return snap_name
+
+    def get_raw(self) -> Tuple[float, ...]:
+        instrument = self.instrument
+        n = len(self.snap_names)
+        if n == 1:
+            p_id = instrument.PARAMETER_NAMES[self.snap_names[0]]
+            values: Tuple[float, ...] = (float(instrument.ask(f'OUTP? '
+                                                              f'{p_id}')),)
+        elif n <= 3:
+            values = instrument.get_values(*self.snap_names)
+        else:
+            with instrument.io_lock:
+                assigned = instrument.get_data_channels_parameters(
+                    query_instrument=False)
+                if assigned != self.snap_names:
+                    for channel, snap_name in zip(instrument.data_channels,
+                                                  self.snap_names):
+                        channel.assigned_parameter(snap_name)
+                values = instrument.get_data_channels_values()
+
+        units = []
+        for name, unit, value in zip(self.names, self.units, values):
+            param = instrument.parameters.get(name)
+            if param is None:
+                units.append(unit)
+                continue
+            # the units of X, Y and R follow the input configuration
+            units.append(param.unit)
+            if hasattr(param, 'cache'):
+                param.cache.set(value)
+            else:
+                param._save_val(value)
+        self.units = tuple(units)
+        return values
+
+
+class SR86xAutoRange(MultiParameter):
+    """
+    Measures lock-in outputs (like `SR86xSnap`, in one query) while keeping
+    the sensitivity matched to the signal. When R leaves the band between
+    `lower` and `upper` times the full scale, the sensitivity is changed to
+    the most sensitive range that puts R at or below `target` times the full
+    scale, the driver waits for the output filter to settle (see
+    `SR86x.settling_time`) and the point is measured again. Since ranges
+    differ by a factor of 2 to 2.5, the new reading lands well inside the
+    band, so the range doesn't flip back and forth.
+
+    The decisions use the R value read with the outputs and the cached
+    sensitivity, so once the range fits, a point costs the same single query
+    as `SR86xSnap`. The input overload indicator (`signal_strength`) is only
+    read when the output is over range or after `input_check_interval`
+    seconds; on an input overload the input range is re-adjusted with
+    `auto_range`.
+
+    The sensitivity used for each point is returned as an extra value
+    (array `<lockin>_sensitivity`). Use `SR86x.autorange` to get one.
+
+    Args:
+        name: parameter name
+        instrument: the SR86x instrument
+        snap_names: up to 4 names from `PARAMETER_NAMES`, including R, or
+            up to 3 without it (R is then read as well but not returned)
+        upper: fraction of full scale above which the range is increased
+        lower: fraction of full scale below which the range is decreased
+        target: fraction of full scale to aim for when changing range
+        max_changes: maximum number of range changes for one point
+        input_check_interval: seconds between checks of the input overload
+            indicator while the output is in range; None to only check when
+            the output is over range
+    """
+    OVERLOAD_STRENGTH = 4
+
+    def __init__(self, name: str, instrument: 'SR86x',
+                 snap_names: Sequence[str], upper: float = 0.9,
+                 lower: float = 0.1, target: float = 0.5,
+                 max_changes: int = 10,
+                 input_check_interval: Optional[float] = 2.0,
+                 **kwargs: Any) -> None:
+        snap_names = tuple(snap_names)
+        if not lower < target < upper <= 1:
+            raise ValueError('Need lower < target < upper <= 1')
+        self._r_hidden = 'R' not in snap_names
+        self._snap = instrument.snap(*(snap_names + ('R',) * self._r_hidden))
+        self._r_index = self._snap.snap_names.index('R')
+        self.upper = upper
+        self.lower = lower
+        self.target = target
+        self.max_changes = max_changes
+        self.input_check_interval = input_check_interval
+        self._last_input_check = time.perf_counter()
+        n = len(snap_names)
+        super().__init__(name,
+                         names=self._snap.names[:n] + ('sensitivity',),
+                         shapes=((),) * (n + 1),
+                         labels=self._snap.labels[:n] + ('Sensitivity',),
+                         units=self._snap.units[:n] + (self._snap.units[
+                             self._r_index],),
+                         instrument=instrument,
+                         docstring=f'{", ".join(snap_names)} with automatic '
+                                   f'sensitivity, and the sensitivity used',
+                         **kwargs)
+
+    def _input_overloaded(self) -> bool:
+        self._last_input_check = time.perf_counter()
+        return (self.instrument.signal_strength() >=
+                self.OVERLOAD_STRENGTH)
+
+    def get_raw(self) -> Tuple[float, ...]:
+        instrument = self.instrument
+        sensitivity = instrument.cached_get('sensitivity')
+        values = self._snap()
+        for _ in range(self.max_changes):
+            r = abs(values[self._r_index])
+            if np.isnan(r):
+                # the reading timed out (see ask_raw)
+                break
+            over = r > self.upper * sensitivity
+            check_input = over or (
+                self.input_check_interval is not None and
+                time.perf_counter() - self._last_input_check >
+                self.input_check_interval)
+            if check_input and self._input_overloaded():
+                log.info(f'{instrument.name}: input overload, adjusting '
+                         f'the input range')
+                instrument.auto_range()
+            elif over or r < self.lower * sensitivity:
+                new = self._choose_sensitivity(r, sensitivity, over)
+                if new == sensitivity:
+                    break
+                instrument.sensitivity(new)
+                sensitivity = new
+            else:
+                break
+            time.sleep(instrument.settling_time())
+            values = self._snap()
+        else:
+            log.warning(f'{instrument.name}: sensitivity still not in range '
+                        f'after {self.max_changes} changes')
+
+        n = len(self.names) - 1
+        self.units = self._snap.units[:n] + (self._snap.units[
+            self._r_index],)
+        return values[:n] + (sensitivity,)
+
+    def _choose_sensitivity(self, r: float, sensitivity: float,
+                            over: bool) -> float:
+        """
+        The most sensitive range that puts r at or below target times the
+        full scale; at least one range up if the output is over range (the
+        reading is clipped then)
+        """
+        ranges = self.instrument.sensitivity_ranges()
+        if over:
+            ranges = [s for s in ranges if s > sensitivity] or [ranges[-1]]
+        for s in ranges:
+            if r <= self.target * s:
+                return s
+        return ranges[-1]
+
+
 class SR86x(VisaInstrument):
     """
     This is the code for Stanford_SR865 Lock-in Amplifier
@@ -665,6 +1276,27 @@ class SR86x(VisaInstrument):
             reset: bool = False,
             **kwargs: Any):
         super().__init__(name, address, terminator='\n', **kwargs)
+        # Held for every exchange with the instrument, so that a background
+        # buffer stream and other queries don't interleave on the bus
+        self.io_lock = threading.RLock()
+        # A query that times out is asked once more; if that fails too the
+        # answer is nan, and after 5 failed queries in a row the lock-in
+        # isn't asked for 30 s (nan right away), so a sweep keeps going
+        self.retry_policy = RetryPolicy(self.name, deadline=None,
+                                        max_attempts=2,
+                                        exceptions=(VisaIOError,),
+                                        fallback=np.nan,
+                                        on_retry=self._clear_pending)
+        # State cache: the settings this driver has set or read itself are
+        # taken as the instrument's state until something invalidates them
+        # (reset, the auto functions, a change of input mode). Snapshots then
+        # serve them without querying, and the sensitivity table lookup uses
+        # the known input mode. Call invalidate_state() after changing
+        # settings on the front panel, or set cache_state to False.
+        self.cache_state = True
+        self._signal_input: Optional[str] = None
+        self._state_invalidated: Dict[str, datetime] = {}
+        self._state_reset_time = datetime.now()
         self._max_frequency = max_frequency
         # Reference commands
         self.add_parameter(name='frequency',
@@ -849,9 +1481,13 @@ class SR86x(VisaInstrument):
         )
 
         # Auto functions
-        self.add_function('auto_range', call_cmd='ARNG')
-        self.add_function('auto_scale', call_cmd='ASCL')
-        self.add_function('auto_phase', call_cmd='APHS')
+        self.add_function('auto_range',
+                          call_cmd=self._invalidating('ARNG', 'input_range'))
+        self.add_function('auto_scale',
+                          call_cmd=self._invalidating('ASCL', 'sensitivity',
+                                                      'input_range'))
+        self.add_function('auto_phase',
+                          call_cmd=self._invalidating('APHS', 'phase'))
 
         # Data transfer
         # first 4 parameters from a list of 16 below.
@@ -959,7 +1595,7 @@ class SR86x(VisaInstrument):
         self.add_submodule("data_channels", data_channels)
 
         # Interface
-        self.add_function('reset', call_cmd='*RST')
+        self.add_function('reset', call_cmd=self._invalidating('*RST'))
 
         self.add_function('disable_front_panel', call_cmd='OVRM 0')
         self.add_function('enable_front_panel', call_cmd='OVRM 1')
@@ -973,7 +1609,9 @@ class SR86x(VisaInstrument):
     #### This is the main modification to this driver. It should
     def ask_raw(self, cmd: str) -> str:
         """
-        Low-level interface to ``visa_handle.ask``.
+        Low-level interface to ``visa_handle.ask``. Queries that time out
+        are retried as set by ``retry_policy``; if they still fail the
+        response is nan, so that a measurement keeps going.
 
         Args:
             cmd: The command to send to the instrument.
@@ -981,16 +1619,37 @@ class SR86x(VisaInstrument):
         Returns:
             str: The instrument's response.
         """
+        return self.retry_policy.call(self._ask_once, cmd)
+    ####
+
+    def _ask_once(self, cmd: str) -> str:
+        # DelayedKeyboardInterrupt installs a signal handler, which can only
+        # be done from the main thread
+        if threading.current_thread() is not threading.main_thread():
+            return self._query(cmd)
         with DelayedKeyboardInterrupt():
-            try:
-                self.visa_log.debug(f"Querying: {cmd}")
-                response = self.visa_handle.query(cmd)
-                self.visa_log.debug(f"Response: {response}")
-            except VisaIOError as e:
-                log.warning('Lockin 865 measurement error: ', e)
-                response = np.nan
+            return self._query(cmd)
+
+    def _query(self, cmd: str) -> str:
+        with self.io_lock:
+            self.visa_log.debug(f"Querying: {cmd}")
+            response = self.visa_handle.query(cmd)
+            self.visa_log.debug(f"Response: {response}")
         return response
-    ####
+
+    def _clear_pending(self, error: Any) -> None:
+        """
+        Clears a late reply to a query that timed out, so that it isn't
+        read as the reply to the retry.
+        """
+        try:
+            self.device_clear()
+        except VisaIOError:
+            pass
+
+    def write_raw(self, cmd: str) -> None:
+        with self.io_lock:
+            super().write_raw(cmd)
 
     def _set_units(self, unit: str) -> None:
         for param in [self.X, self.Y, self.R, self.sensitivity]:
@@ -1000,40 +1659,150 @@ class SR86x(VisaInstrument):
         x, y = self.get_values('X', 'Y')
         return x + 1.0j*y
 
-    def _get_input_config(self, s: int) -> str:
-        mode = self._N_TO_INPUT_SIGNAL[int(s)]
-
+    def _update_signal_input(self, mode: str) -> None:
+        """
+        Records the input mode (voltage or current), switching the units of
+        X, Y, R and the sensitivity and the sensitivity values only when it
+        changes. The sensitivity index is kept by the instrument when the mode
+        changes, so the cached sensitivity is no longer valid then.
+        """
+        if mode == self._signal_input:
+            return
         if mode == 'voltage':
             self.sensitivity.vals = self._VOLT_ENUM
             self._set_units('V')
         else:
             self.sensitivity.vals = self._CURR_ENUM
             self._set_units('A')
+        if self._signal_input is not None:
+            self.invalidate_state('sensitivity')
+        self._signal_input = mode
 
+    def _get_input_config(self, s: int) -> str:
+        mode = self._N_TO_INPUT_SIGNAL[int(s)]
+        self._update_signal_input(mode)
         return mode
 
     def _set_input_config(self, s: str) -> int:
-        if s == 'voltage':
-            self.sensitivity.vals = self._VOLT_ENUM
-            self._set_units('V')
-        else:
-            self.sensitivity.vals = self._CURR_ENUM
-            self._set_units('A')
-
+        self._update_signal_input(s)
         return self._INPUT_SIGNAL_TO_N[s]
 
+    def _signal_input_mode(self) -> str:
+        """
+        The input mode, from the state cache if it is known
+        """
+        if self._signal_input is None or not self.cache_state:
+            self.signal_input()
+        return self._signal_input
+
     def _get_sensitivity(self, s: int) -> float:
-        if self.signal_input() == 'voltage':
+        if self._signal_input_mode() == 'voltage':
             return self._N_TO_VOLT[int(s)]
         else:
             return self._N_TO_CURR[int(s)]
 
     def _set_sensitivity(self, s: float) -> int:
-        if self.signal_input() == 'voltage':
+        if self._signal_input_mode() == 'voltage':
             return self._VOLT_TO_N[s]
         else:
             return self._CURR_TO_N[s]
 
+    def sensitivity_ranges(self) -> List[float]:
+        """
+        The sensitivities (full scale values) of the current input mode, from
+        the most to the least sensitive
+        """
+        if self._signal_input_mode() == 'voltage':
+            return sorted(self._VOLT_TO_N)
+        return sorted(self._CURR_TO_N)
+
+    # Multiples of the time constant for the output to settle to 99 % after
+    # a step, by filter slope (dB/oct)
+    _SETTLING_TIME_CONSTANTS = {6: 5, 12: 7, 18: 9, 24: 10}
+
+    def settling_time(self) -> float:
+        """
+        Time (s) the output filter needs to settle to 99 % after a step,
+        from the time constant and filter slope (from the state cache when
+        they are known)
+        """
+        return (self.cached_get('time_constant') *
+                self._SETTLING_TIME_CONSTANTS[self.cached_get('filter_slope')])
+
+    def cached_get(self, name: str) -> Any:
+        """
+        Value of a setting from the state cache if it is known, otherwise
+        queried from the instrument
+
+        Args:
+            name: name of a parameter of this instrument
+        """
+        if self.cache_state and self._state_known(name):
+            return self.parameters[name].get_latest()
+        return self.parameters[name].get()
+
+    def _invalidating(self, cmd: str, *names: str) -> Callable[[], None]:
+        """
+        Returns a function that writes a command that changes settings on
+        the instrument, and then invalidates the cached values of those
+        settings (all of them if no names are given)
+        """
+        def call() -> None:
+            self.write(cmd)
+            self.invalidate_state(*names)
+        return call
+
+    def invalidate_state(self, *names: str) -> None:
+        """
+        Forgets the cached values of the given parameters (of all of them if
+        no names are given), so that they are queried from the instrument the
+        next time they are needed. Use this after changing settings on the
+        front panel.
+
+        Args:
+            *names: names of parameters of this instrument
+        """
+        now = datetime.now()
+        if not names:
+            self._state_reset_time = now
+            self._state_invalidated.clear()
+            self._signal_input = None
+            names = tuple(self.parameters)
+        for name in names:
+            self._state_invalidated[name] = now
+            param = self.parameters[name]
+            if hasattr(param, 'cache'):
+                param.cache.invalidate()
+
+    def _state_known(self, name: str) -> bool:
+        """
+        Whether the cached value of a setting is known to be the
+        instrument's state: it was set or read after the last invalidation
+        """
+        param = self.parameters[name]
+        if not getattr(param, 'settable', getattr(param, 'has_set', False)):
+            return False
+        if hasattr(param, 'cache'):
+            ts = param.cache.timestamp
+        else:
+            ts = param._latest.get('ts')
+        since = self._state_invalidated.get(name, self._state_reset_time)
+        return ts is not None and ts > since
+
+    def snapshot_base(self, update: Optional[bool] = False,
+                      params_to_skip_update: Optional[Sequence[str]] = None
+                      ) -> Dict[Any, Any]:
+        """
+        Like `Instrument.snapshot_base`, except that with update=True the
+        settings in the state cache are not queried again
+        """
+        if update and self.cache_state:
+            params_to_skip_update = (
+                list(params_to_skip_update or []) +
+                [name for name in self.parameters if self._state_known(name)])
+        return super().snapshot_base(
+            update=update, params_to_skip_update=params_to_skip_update)
+
     def get_values(self, *parameter_names: str) -> Tuple[float, ...]:
         """
         Get values of 2 or 3 parameters that are measured by the lock-in
@@ -1063,8 +1832,77 @@ class SR86x(VisaInstrument):
 
         p_ids = [self.PARAMETER_NAMES[name] for name in parameter_names]
         output = self.ask(f'SNAP? {",".join(p_ids)}')
+        if not isinstance(output, str):
+            # ask_raw returns nan after a timeout
+            return (np.nan,) * len(p_ids)
         return tuple(float(val) for val in output.split(','))
 
+    def snap(self, *parameter_names: str) -> SR86xSnap:
+        """
+        Returns a parameter that reads all of the given quantities with one
+        query (see `SR86xSnap`), for measuring e.g. X, Y, R and P at every
+        point of a sweep with a single round-trip:
+
+            single_param_sweep(gate, vals, 0.1, lockin.snap('X', 'Y', 'R', 'P'))
+
+        The parameter is added to the instrument as e.g. `snap_X_Y_R_P` and
+        reused by later calls with the same names.
+
+        Args:
+            *parameter_names: 1 to 4 names from `PARAMETER_NAMES`
+
+        Returns:
+            the snapshot parameter
+        """
+        name = 'snap_' + '_'.join(parameter_names)
+        if name not in self.parameters:
+            self.add_parameter(name, parameter_class=SR86xSnap,
+                               snap_names=parameter_names)
+        return self.parameters[name]
+
+    def autorange(self, *parameter_names: str,
+                  **kwargs: Any) -> SR86xAutoRange:
+        """
+        Returns a parameter that measures the given outputs (X and Y by
+        default) in one query and adjusts the sensitivity as the signal
+        changes, returning the sensitivity used with each point (see
+        `SR86xAutoRange` for the options):
+
+            single_param_sweep(gate, vals, 0.1, lockin.autorange('X', 'Y'))
+
+        The parameter is added to the instrument as e.g. `autorange_X_Y`;
+        later calls with the same names return it, with the options updated.
+
+        Args:
+            *parameter_names: names from `PARAMETER_NAMES`
+            **kwargs: upper, lower, target, max_changes,
+                input_check_interval
+
+        Returns:
+            the auto-ranging parameter
+        """
+        parameter_names = parameter_names or ('X', 'Y')
+        name = 'autorange_' + '_'.join(parameter_names)
+        if name not in self.parameters:
+            self.add_parameter(name, parameter_class=SR86xAutoRange,
+                               snap_names=parameter_names, **kwargs)
+        else:
+            for option, value in kwargs.items():
+                setattr(self.parameters[name], option, value)
+        return self.parameters[name]
+
+    def snap_name(self, parameter: Any) -> Optional[str]:
+        """
+        Returns the name in `PARAMETER_NAMES` of the quantity that a
+        parameter of this driver reads (e.g. 'aux_in1' for `aux_in0`), or
+        None if it isn't one of them
+        """
+        for snap_name in self.PARAMETER_NAMES:
+            name = SR86xSnap.parameter_name(snap_name)
+            if self.parameters.get(name) is parameter:
+                return snap_name
+        return None
+
     def get_data_channels_values(self) -> Tuple[float, ...]:
         """
         Queries the current values of the data channels
@@ -1073,6 +1911,8 @@ class SR86x(VisaInstrument):
             tuple of 4 values of the data channels
         """
         output = self.ask('SNAPD?')
+        if not isinstance(output, str):
+            return (np.nan,) * self._N_DATA_CHANNELS
         return tuple(float(val) for val in output.split(','))
 
     def get_data_channels_parameters(self, query_instrument: bool = True
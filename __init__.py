@@ -1,62 +1,103 @@
 import sys
-import subprocess
-
-from qcodes.instrument_drivers.tektronix.Keithley_2000 import Keithley_2000
-from qcodes.instrument_drivers.nplab_drivers.Keithley_6221 import Keithley_6221
-from qcodes.instrument_drivers.nplab_drivers.Keithley_2182a import Keithley_2182a
-from qcodes.instrument_drivers.nplab_drivers.Keithley_2200 import Keithley_2200
-from qcodes.instrument_drivers.nplab_drivers.LR_700 import LR_700
-from qcodes.instrument_drivers.nplab_drivers.SIM900 import SIM900
-from qcodes.instrument_drivers.nplab_drivers.SIM900_stick import SIM900_stick
-from qcodes.instrument_drivers.nplab_drivers.SIM900_rs232 import SIM900_rs232
-from qcodes.instrument_drivers.nplab_drivers.OpenDacs_Seekat import Seekat
-from qcodes.instrument_drivers.nplab_drivers.OpenDacs_DAC_ADC import DAC_ADC
-from qcodes.instrument_drivers.stanford_research.SR830 import SR830
-## This SR865A is the standard one, with normal error handling
-# from qcodes.instrument_drivers.stanford_research.SR865A import SR865A
-## This SR865A contains error handling that allows a timeout error to occur
-## and keeps measuring
-from qcodes.instrument_drivers.nplab_drivers.SR865A import SR865A
-from qcodes.instrument_drivers.nplab_drivers.vdpArduino import vdpArduino
-from qcodes.instrument_drivers.nplab_drivers.NPTriton import Triton
-from qcodes.instrument_drivers.nplab_drivers.SR560 import SR560
-from qcodes.instrument_drivers.nplab_drivers.SRDC205 import SRDC205
-from qcodes.instrument_drivers.nplab_drivers.Lakeshore211 import Lakeshore211
-from qcodes.instrument_drivers.nplab_drivers.plot_tools import (get2d_dat,
-                        dvdi2dfromiv, concat_2d,
-                        val_to_index, mov_average,
-                        iv_from_dvdi,
-                        Rxxfromdata,
-                        RapidTwoSlopeNorm,
-                        DivLogNorm,
-                        DivSymLogNorm,
-                        graphene_mobilityFE,
-                        graphene_mobilityB,
-                        gr_Boltzmannfit)
-
-from qcodes.instrument_drivers.nplab_drivers.time_params import (
-        time_from_start,
-        time_stamp,
-        output_datetime,
-        output_date_strings)
-
-from qcodes.instrument_drivers.nplab_drivers.common_commands import (
-        single_param_sweep,
-        twod_param_sweep,
-        data_log, breakat)
-
-
-from qcodes.instrument_drivers.nplab_drivers.instrumentinitialize import (
-        ppms_init,
-        triton_init,
-        stick_setup_init)
-
-from .bipolarcolor import bipolar
+from importlib import import_module
+
+# Nothing is imported until it's used: each name below is looked up in its
+# module the first time it's accessed (npd.Keithley_6221, npd.single_param_sweep,
+# ...). Importing every driver eagerly pulls in pyserial, win32com, scipy,
+# pandas and matplotlib and makes importing the package take several seconds.
+_lazy_attrs = {
+    'Keithley_2000': 'qcodes.instrument_drivers.tektronix.Keithley_2000',
+    'Keithley_6221': '.Keithley_6221',
+    'Keithley_2182a': '.Keithley_2182a',
+    'Keithley_2200': '.Keithley_2200',
+    'LR_700': '.LR_700',
+    'SIM900': '.SIM900',
+    'SIM900_stick': '.SIM900_stick',
+    'SIM900_rs232': '.SIM900_rs232',
+    'Seekat': '.OpenDacs_Seekat',
+    'DAC_ADC': '.OpenDacs_DAC_ADC',
+    'SR830': 'qcodes.instrument_drivers.stanford_research.SR830',
+    ## This SR865A is the standard one, with normal error handling
+    # 'SR865A': 'qcodes.instrument_drivers.stanford_research.SR865A',
+    ## This SR865A contains error handling that allows a timeout error to occur
+    ## and keeps measuring
+    'SR865A': '.SR865A',
+    'vdpArduino': '.vdpArduino',
+    'Triton': '.NPTriton',
+    'SR560': '.SR560',
+    'SRDC205': '.SRDC205',
+    'Lakeshore211': '.Lakeshore211',
+
+    'get2d_dat': '.plot_tools',
+    'dvdi2dfromiv': '.plot_tools',
+    'concat_2d': '.plot_tools',
+    'val_to_index': '.plot_tools',
+    'mov_average': '.plot_tools',
+    'iv_from_dvdi': '.plot_tools',
+    'Rxxfromdata': '.plot_tools',
+    'RapidTwoSlopeNorm': '.plot_tools',
+    'DivLogNorm': '.plot_tools',
+    'DivSymLogNorm': '.plot_tools',
+    'graphene_mobilityFE': '.plot_tools',
+    'graphene_mobilityB': '.plot_tools',
+    'gr_Boltzmannfit': '.plot_tools',
+    # only defined by plot_tools if qtplot 0.2.5 is installed
+    'qt2dplot': '.plot_tools',
+
+    'time_from_start': '.time_params',
+    'time_stamp': '.time_params',
+    'output_datetime': '.time_params',
+    'output_date_strings': '.time_params',
+
+    'single_param_sweep': '.common_commands',
+    'twod_param_sweep': '.common_commands',
+    'data_log': '.common_commands',
+    'breakat': '.common_commands',
+    'delta_live_sweep': '.common_commands',
+    'coalesce_reads': '.common_commands',
+
+    'ppms_init': '.instrumentinitialize',
+    'triton_init': '.instrumentinitialize',
+    'stick_setup_init': '.instrumentinitialize',
+    'load_rack': '.instrumentinitialize',
+
+    'MeasurementCatalog': '.catalog',
+    'RetryPolicy': '.retry',
+    'wait_until': '.waiting',
+
+    'bipolar': '.bipolarcolor',
+}
 
 if sys.platform == 'win32':
-    from .QD import QD
+    _lazy_attrs['QD'] = '.QD'
+
+
+def __getattr__(name):
+    """Import the module that provides name on first access and cache the
+    result in the package namespace"""
+    if name not in _lazy_attrs:
+        raise AttributeError('module {!r} has no attribute '
+                             '{!r}'.format(__name__, name))
+    module = import_module(_lazy_attrs[name], __name__)
+    try:
+        value = getattr(module, name)
+    except AttributeError:
+        raise AttributeError('module {!r} has no attribute {!r} ({} does not '
+                             'define it)'.format(__name__, name,
+                                                 module.__name__)) from None
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attrs))
+
 
-reqs = subprocess.check_output([sys.executable, '-m', 'pip', 'freeze'])
-installed_packages = [r.decode() for r in reqs.split()]
-if 'qtplot==0.2.5' in installed_packages:
-    from .plot_tools import qt2dplot
+# Module-level __getattr__ only exists from python 3.7 on (PEP 562), so
+# older environments get everything imported up front like before
+if sys.version_info < (3, 7):
+    for _name in list(_lazy_attrs):
+        try:
+            __getattr__(_name)
+        except AttributeError:
+            pass
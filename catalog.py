@@ -0,0 +1,310 @@
+""" A searchable catalog of the (legacy) qcodes datasets made by
+single_param_sweep, twod_param_sweep and data_log.
+
+The metadata from each dataset's snapshot.json (instrument parameters, sweep
+axes, array shapes, timestamps) is kept in an SQLite index next to the data,
+so that questions like "all field sweeps at 20 mK with lockin865 sensitivity
+1 mV" don't require opening every snapshot. Only the datasets whose snapshot
+changed since the last update() are re-read.
+
+Example:
+    cat = MeasurementCatalog('C:/data')
+    cat.update()
+    cat.find(sweep='triton_field', triton_MC_temp=(0, 0.025),
+             lockin865_sensitivity=1e-3)
+"""
+
+import json
+import os
+import sqlite3
+from numbers import Number
+
+
+SNAPSHOT_FILE = 'snapshot.json'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    id INTEGER PRIMARY KEY,
+    location TEXT UNIQUE NOT NULL,
+    mtime REAL,
+    size INTEGER,
+    ts_start TEXT,
+    ts_end TEXT
+);
+CREATE TABLE IF NOT EXISTS params (
+    dataset_id INTEGER NOT NULL,
+    full_name TEXT NOT NULL,
+    value_num REAL,
+    value_str TEXT,
+    unit TEXT
+);
+CREATE TABLE IF NOT EXISTS axes (
+    dataset_id INTEGER NOT NULL,
+    level INTEGER,
+    full_name TEXT NOT NULL,
+    start REAL,
+    stop REAL,
+    num INTEGER
+);
+CREATE TABLE IF NOT EXISTS arrays (
+    dataset_id INTEGER NOT NULL,
+    array_id TEXT NOT NULL,
+    is_setpoint INTEGER,
+    unit TEXT,
+    shape TEXT
+);
+CREATE INDEX IF NOT EXISTS params_num ON params (full_name, value_num);
+CREATE INDEX IF NOT EXISTS params_str ON params (full_name, value_str);
+CREATE INDEX IF NOT EXISTS params_ds ON params (dataset_id);
+CREATE INDEX IF NOT EXISTS axes_name ON axes (full_name);
+CREATE INDEX IF NOT EXISTS axes_ds ON axes (dataset_id);
+CREATE INDEX IF NOT EXISTS arrays_id ON arrays (array_id);
+CREATE INDEX IF NOT EXISTS arrays_ds ON arrays (dataset_id);
+"""
+
+
+def _full_name(snap, prefix=''):
+    """ qcodes full name (instrument_param) of a parameter snapshot """
+    if 'full_name' in snap:
+        return snap['full_name']
+    if snap.get('instrument_name'):
+        return snap['instrument_name'] + '_' + snap['name']
+    return prefix + snap.get('name', '')
+
+
+def _split_value(value):
+    """ Returns (value_num, value_str) for storing a snapshot value """
+    if isinstance(value, bool):
+        return int(value), None
+    elif isinstance(value, Number):
+        return float(value), None
+    elif value is None or isinstance(value, str):
+        return None, value
+    else:
+        return None, json.dumps(value)
+
+
+def _instrument_params(name, snap):
+    """ Yields (full_name, value, unit) for every parameter of an instrument
+    snapshot, including the ones in its submodules/channels """
+    for pname, psnap in snap.get('parameters', {}).items():
+        if 'value' not in psnap:
+            continue
+        full_name = _full_name(psnap, prefix=name + '_')
+        yield full_name, psnap['value'], psnap.get('unit')
+    for subname, subsnap in snap.get('submodules', {}).items():
+        # channels are already prefixed with the instrument name
+        if not subname.startswith(name):
+            subname = name + '_' + subname
+        yield from _instrument_params(subname, subsnap)
+
+
+def _sweep_range(sweep_snap):
+    """ (start, stop, num) of a loop's sweep_values snapshot """
+    start = stop = None
+    num = 0
+    for chunk in sweep_snap.get('values', []):
+        if 'first' in chunk:
+            first, last, n = chunk['first'], chunk['last'], chunk['num']
+        elif chunk.get('values'):
+            first, last, n = (chunk['values'][0], chunk['values'][-1],
+                              len(chunk['values']))
+        elif 'item' in chunk:
+            first = last = chunk['item']
+            n = 1
+        else:
+            continue
+        if start is None:
+            start = first
+        stop = last
+        num += n
+    return start, stop, num
+
+
+def _loop_axes(loop_snap, level=0):
+    """ Yields (level, full_name, start, stop, num) for a loop and the loops
+    nested in its actions (level 0 is the outer loop) """
+    sweep = loop_snap.get('sweep_values')
+    if sweep and 'parameter' in sweep:
+        yield (level, _full_name(sweep['parameter'])) + _sweep_range(sweep)
+    for action in loop_snap.get('actions', []):
+        if isinstance(action, dict) and 'sweep_values' in action:
+            yield from _loop_axes(action, level + 1)
+
+
+class MeasurementCatalog:
+    """ SQLite index of the snapshot metadata of every dataset under
+    data_dir.
+
+    Args:
+        data_dir: top folder of the qcodes data (the io location)
+        index_path: where to keep the index. Defaults to catalog.sqlite
+            inside data_dir
+
+    Call update() to (re)index datasets that are new or changed, then query
+    with find() and info().
+    """
+    def __init__(self, data_dir, index_path=None):
+        self.data_dir = os.path.abspath(data_dir)
+        if index_path is None:
+            index_path = os.path.join(self.data_dir, 'catalog.sqlite')
+        self.index_path = index_path
+        self._db = sqlite3.connect(index_path)
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def update(self):
+        """ Scans data_dir for snapshots and indexes the ones that were added
+        or modified since the last update. Datasets that were deleted are
+        dropped from the index.
+
+        Returns: (number of datasets indexed, number removed)"""
+        known = {loc: (mtime, size) for loc, mtime, size in
+                 self._db.execute('SELECT location, mtime, size FROM datasets')}
+        found = set()
+        indexed = 0
+        with self._db:
+            for dirpath, dirnames, filenames in os.walk(self.data_dir):
+                if SNAPSHOT_FILE not in filenames:
+                    continue
+                location = os.path.relpath(dirpath, self.data_dir)
+                found.add(location)
+                st = os.stat(os.path.join(dirpath, SNAPSHOT_FILE))
+                if known.get(location) == (st.st_mtime, st.st_size):
+                    continue
+                try:
+                    with open(os.path.join(dirpath, SNAPSHOT_FILE)) as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    # probably still being written; pick it up next time
+                    continue
+                self._index(location, st.st_mtime, st.st_size, snapshot)
+                indexed += 1
+
+            removed = [loc for loc in known if loc not in found]
+            for location in removed:
+                self._remove(location)
+        return indexed, len(removed)
+
+    def _remove(self, location):
+        row = self._db.execute('SELECT id FROM datasets WHERE location = ?',
+                               (location,)).fetchone()
+        if row is None:
+            return
+        for table in ('params', 'axes', 'arrays'):
+            self._db.execute('DELETE FROM {} WHERE dataset_id = ?'.format(table),
+                             row)
+        self._db.execute('DELETE FROM datasets WHERE id = ?', row)
+
+    def _index(self, location, mtime, size, snapshot):
+        self._remove(location)
+        loop = snapshot.get('loop', {})
+        cur = self._db.execute(
+            'INSERT INTO datasets (location, mtime, size, ts_start, ts_end) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (location, mtime, size, loop.get('ts_start'), loop.get('ts_end')))
+        ds_id = cur.lastrowid
+
+        instruments = snapshot.get('station', {}).get('instruments', {})
+        rows = []
+        for iname, isnap in instruments.items():
+            for full_name, value, unit in _instrument_params(iname, isnap):
+                rows.append((ds_id, full_name) + _split_value(value) + (unit,))
+        self._db.executemany('INSERT INTO params VALUES (?, ?, ?, ?, ?)',
+                             rows)
+
+        self._db.executemany(
+            'INSERT INTO axes VALUES (?, ?, ?, ?, ?, ?)',
+            [(ds_id,) + axis for axis in _loop_axes(loop)])
+
+        arrays = snapshot.get('arrays', {})
+        self._db.executemany(
+            'INSERT INTO arrays VALUES (?, ?, ?, ?, ?)',
+            [(ds_id, array_id, int(bool(asnap.get('is_setpoint'))),
+              asnap.get('unit'), json.dumps(asnap.get('shape')))
+             for array_id, asnap in arrays.items()])
+
+    def find(self, sweep=None, measured=None, name=None, after=None,
+             before=None, **params):
+        """ Returns the locations (full paths, usable with qc.load_data) of
+        the datasets that match every condition given, oldest first.
+
+        sweep: full name of a swept parameter (either loop of a 2D sweep),
+            e.g. 'triton_field'
+        measured: array id of a measured (not setpoint) array,
+            e.g. 'lockin865_X'
+        name: part of the dataset location, e.g. the DataName of the sweep
+        after, before: limits on the loop start time, as
+            'YYYY-MM-DD HH:MM:SS' strings (or just the date)
+        **params: instrument parameter values from the snapshot, by full
+            name. A number or string must match (numbers to within 1e-9
+            relative), a (low, high) tuple is an inclusive range, e.g.
+            lockin865_sensitivity=1e-3, triton_MC_temp=(0, 0.025)
+        """
+        where = []
+        args = []
+        if sweep is not None:
+            where.append('id IN (SELECT dataset_id FROM axes '
+                         'WHERE full_name = ?)')
+            args.append(str(sweep))
+        if measured is not None:
+            where.append('id IN (SELECT dataset_id FROM arrays '
+                         'WHERE array_id = ? AND is_setpoint = 0)')
+            args.append(str(measured))
+        if name is not None:
+            where.append('location LIKE ?')
+            args.append('%' + name + '%')
+        if after is not None:
+            where.append('ts_start >= ?')
+            args.append(after)
+        if before is not None:
+            where.append('ts_start <= ?')
+            args.append(before)
+        for full_name, value in params.items():
+            if isinstance(value, tuple):
+                low, high = value
+                cond = 'value_num BETWEEN ? AND ?'
+                vargs = [low, high]
+            elif isinstance(value, Number):
+                cond = 'ABS(value_num - ?) <= ?'
+                vargs = [float(value), 1e-9*abs(value)]
+            else:
+                cond = 'value_str = ?'
+                vargs = [value]
+            where.append('id IN (SELECT dataset_id FROM params '
+                         'WHERE full_name = ? AND {})'.format(cond))
+            args.extend([full_name] + vargs)
+
+        query = 'SELECT location FROM datasets'
+        if where:
+            query += ' WHERE ' + ' AND '.join(where)
+        query += ' ORDER BY ts_start'
+        return [os.path.join(self.data_dir, loc) for (loc,) in
+                self._db.execute(query, args)]
+
+    def info(self, location):
+        """ Returns the indexed metadata of one dataset as a dict with the
+        keys ts_start, ts_end, axes (list of (full_name, start, stop, num),
+        outer loop first), arrays ({array_id: shape}) and params
+        ({full_name: value}) """
+        location = os.path.relpath(os.path.abspath(location), self.data_dir)
+        row = self._db.execute('SELECT id, ts_start, ts_end FROM datasets '
+                               'WHERE location = ?', (location,)).fetchone()
+        if row is None:
+            raise KeyError('{} is not in the catalog'.format(location))
+        ds_id, ts_start, ts_end = row
+        axes = [tuple(r) for r in self._db.execute(
+            'SELECT full_name, start, stop, num FROM axes '
+            'WHERE dataset_id = ? ORDER BY level', (ds_id,))]
+        arrays = {array_id: json.loads(shape) for array_id, shape in
+                  self._db.execute('SELECT array_id, shape FROM arrays '
+                                   'WHERE dataset_id = ?', (ds_id,))}
+        params = {}
+        for full_name, vnum, vstr in self._db.execute(
+                'SELECT full_name, value_num, value_str FROM params '
+                'WHERE dataset_id = ?', (ds_id,)):
+            params[full_name] = vnum if vnum is not None else vstr
+        return {'ts_start': ts_start, 'ts_end': ts_end, 'axes': axes,
+                'arrays': arrays, 'params': params}
@@ -7,6 +7,37 @@ import time
 from qcodes.instrument_drivers.nplab_drivers.time_params import time_from_start
 
 
+def coalesce_reads(*MeasParams):
+    """ Replaces the lock-in outputs (X, Y, R, P, ...) of each SR86x lock-in
+    that are measured at the same point by one parameter that reads them all
+    with a single query (lockin.snap, at most 4 per query). The values then
+    come from the same measurement cycle and only one round-trip is needed
+    instead of one per output. The DataArrays keep their usual names
+    (lockin865_X etc.), so plots and analysis don't change. Other parameters
+    are returned as they are, in the same order (the snapshot parameter takes
+    the place of the first of its outputs).
+
+    single_param_sweep, twod_param_sweep and data_log call this on their
+    MeasParams."""
+    groups = {}
+    for param in MeasParams:
+        inst = getattr(param, '_instrument', None)
+        if hasattr(inst, 'snap_name') and inst.snap_name(param) is not None:
+            groups.setdefault(id(inst), []).append(param)
+
+    reads = []
+    for param in MeasParams:
+        group = groups.get(id(getattr(param, '_instrument', None)))
+        if not group or len(group) == 1:
+            reads.append(param)
+        elif param is group[0]:
+            inst = param._instrument
+            names = [inst.snap_name(p) for p in group]
+            for i in range(0, len(names), inst._N_DATA_CHANNELS):
+                reads.append(inst.snap(*names[i:i + inst._N_DATA_CHANNELS]))
+    return reads
+
+
 def single_param_sweep(SetParam, SetArray, delay, *MeasParams,
                        DataName='', XParam=None, YParam=None,
                        plot_results=True, save_plots=True):
@@ -36,7 +67,8 @@ def single_param_sweep(SetParam, SetArray, delay, *MeasParams,
                 sweep
     """
 
-    loop = qc.Loop(SetParam[SetArray], delay=delay).each(*MeasParams)
+    loop = qc.Loop(SetParam[SetArray],
+                   delay=delay).each(*coalesce_reads(*MeasParams))
     data = loop.get_data_set(name=DataName)
     plot = []
 
@@ -152,7 +184,7 @@ def twod_param_sweep(SetParam1, SetArray1, SetParam2, SetArray2, *MeasParams,
             return
 
     innerloop = qc.Loop(SetParam2[SetArray2],
-                        delay=SetDelay2).each(*MeasParams)
+                        delay=SetDelay2).each(*coalesce_reads(*MeasParams))
     twodloop = qc.Loop(SetParam1[SetArray1],
                        delay=SetDelay1).each(innerloop, qc.Task(between_func))
     data = twodloop.get_data_set(name=DataName)
@@ -254,14 +286,16 @@ def data_log(delay, *MeasParams, N=None, minutes=None, DataName='',
         return ValueError('Only use N or minutes arguments')
     elif N is not None and minutes is None:
         loop = qc.Loop(count.sweep(1, int(N), step=1)).each(time0,
-                                                            *MeasParams,
+                                                            *coalesce_reads(
+                                                                *MeasParams),
                                                             qc.Wait(delay),
                                                             qc.BreakIf(
                                                                 breakif))
     elif minutes is not None and N is None:
         N = ceil(minutes*60/delay)
         loop = qc.Loop(count.sweep(1, int(N), step=1)).each(time0,
-                                                            *MeasParams,
+                                                            *coalesce_reads(
+                                                                *MeasParams),
                                                             qc.Wait(delay),
                                                             qc.BreakIf(
                                                                 breakif))
@@ -338,6 +372,75 @@ def data_log(delay, *MeasParams, N=None, minutes=None, DataName='',
         return data, plot
 
 
+def delta_live_sweep(k6, DataName='', plot_results=True, save_plots=True,
+                     poll_interval=0.5):
+    """ Runs the delta or differential conductance sweep armed on the
+    Keithley 6221 with const_delta_setup or delta_diff_setup, and stores the
+    readings in a DataSet as they arrive (only the new buffer entries are
+    read every poll_interval seconds), with a live plot. The arrays have the
+    same names as when measuring constdelta/deltadcon in a loop.
+
+    Ctrl-C aborts the run early and keeps the data taken so far.
+
+    Returns: data (a qcodes DataSet object), plot
+
+    Arguments:
+    k6: the Keithley_6221 instrument, armed with a setup
+    Keyword Arguments:
+    DataName: A name to tag the data (defaults to nothing)
+    plot_results: True by default, if false, suppresses plotting
+    save_plots: True by default. If false, doesn't save plots at the end of the
+                sweep
+    poll_interval: seconds between buffer reads
+    """
+    param = k6.parameters[k6._delta_param]
+    points = len(k6.sweep_current)
+    current = qc.DataArray(name='current', array_id='current_set',
+                           label='Current', unit='A', is_setpoint=True,
+                           preset_data=k6.sweep_current)
+    if hasattr(param, 'full_names'):
+        array_ids = param.full_names
+        labels, units = param.labels, param.units
+    else:
+        array_ids = (param.full_name,)
+        labels, units = (param.label,), (param.unit,)
+    arrays = [qc.DataArray(name=array_id, array_id=array_id, label=label,
+                           unit=unit, shape=(points,), set_arrays=(current,))
+              for array_id, label, unit in zip(array_ids, labels, units)]
+    for array in arrays:
+        array.init_data()
+    data = qc.new_data(arrays=[current] + arrays, name=DataName)
+
+    plot = []
+    if plot_results:
+        plot = qc.QtPlot(arrays[0], window_title=str(array_ids[0]) +
+                         ' vs. current')
+
+    run = k6.delta_start()
+    try:
+        try:
+            for block in run.stream(poll_interval):
+                start = run.n_fetched - len(block)
+                stop = min(run.n_fetched, points)
+                if start < stop:
+                    arrays[0][start:stop] = block['reading'][:stop - start]
+                    if len(arrays) > 1:
+                        arrays[1][start:stop] = block['time'][:stop - start]
+                data.write()
+                if plot_results:
+                    plot.update()
+        except KeyboardInterrupt:
+            run.cancel()
+            print('Keyboard Interrupt')
+    finally:
+        data.finalize()
+        if plot_results:
+            plot.update()
+            if save_plots:
+                plot.save()
+    return data, plot
+
+
 def breakat(parameter, setpoint, epsilon, waitafter=None, boolcond=None):
     """ Returns a function based on the measured parameter, a setpoint, and an
     epsilon value within which it must be. There is also an optional waitafter
@@ -1,37 +1,201 @@
 # functions used to initalize the instruments on each computer
+#
+# The instruments of each setup (driver, address, options and settings to
+# apply after connecting) are listed in racks/<setup>.yaml. Drivers are only
+# imported and connected when an instrument is first used.
+import os
 import sys
 import time
-
-from qcodes.instrument_drivers.tektronix.Keithley_2000 import Keithley_2000
-from qcodes.instrument_drivers.nplab_drivers.Keithley_6221 import Keithley_6221
-from qcodes.instrument_drivers.nplab_drivers.Keithley_2182a import Keithley_2182a
-from qcodes.instrument_drivers.nplab_drivers.Keithley_2200 import Keithley_2200
-from qcodes.instrument_drivers.nplab_drivers.LR_700 import LR_700
-from qcodes.instrument_drivers.nplab_drivers.OpenDacs_Seekat import Seekat
-from qcodes.instrument_drivers.nplab_drivers.OpenDacs_DAC_ADC import DAC_ADC
-from qcodes.instrument_drivers.nplab_drivers.SIM900 import SIM900
-from qcodes.instrument_drivers.nplab_drivers.SIM900_stick import SIM900_stick
-from qcodes.instrument_drivers.nplab_drivers.SIM900_rs232 import SIM900_rs232
-from qcodes.instrument_drivers.stanford_research.SR830 import SR830
-## This SR865A is the standard one, with normal error handling
-# from qcodes.instrument_drivers.stanford_research.SR865A import SR865A
-## This SR865A contains error handling that allows a timeout error to occur
-## and keeps measuring
-from qcodes.instrument_drivers.nplab_drivers.SR865A import SR865A
-from qcodes.instrument_drivers.nplab_drivers.vdpArduino import vdpArduino
-from qcodes.instrument_drivers.nplab_drivers.NPTriton import Triton
-from qcodes.instrument_drivers.nplab_drivers.SR560 import SR560
-from qcodes.instrument_drivers.nplab_drivers.SRDC205 import SRDC205
-from qcodes.instrument_drivers.nplab_drivers.Lakeshore211 import Lakeshore211
-from qcodes.instrument_drivers.nplab_drivers.Keithley_6221_RS232 import Keithley_6221_rs232
-from qcodes.instrument_drivers.nplab_drivers.Siglent1025 import Siglent1025
+import threading
 import builtins
+from importlib import import_module
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+RACK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'racks')
+
+
+def _load_yaml(path):
+    """Loads a yaml file with ruamel.yaml (which qcodes uses), or pyyaml if
+    that isn't installed"""
+    try:
+        from ruamel.yaml import YAML
+    except ImportError:
+        import yaml
+        with open(path) as f:
+            return yaml.safe_load(f)
+    with open(path) as f:
+        return YAML(typ='safe').load(f)
+
+
+def _expand_codes(instruments, standard):
+    """Lower-cases the instrument codes, replaces 'standard' by the codes in
+    the standard tuple and drops repeats (keeping the order)"""
+    codes = []
+    for inst in instruments:
+        if inst.lower() == 'standard':
+            codes.extend(standard)
+        else:
+            codes.append(inst.lower())
+    return list(dict.fromkeys(codes))
+
+
+def parallel_init(instrs_func, codes, max_workers=None):
+    """Calls instrs_func(code) for every instrument code at the same time,
+    each in its own thread, so that the connections (GPIB, TCP, COM) and
+    IDN queries of independent instruments overlap. Bringing up a rack takes
+    about as long as the slowest instrument.
+
+    An instrument that fails to connect doesn't stop the others; its error
+    is printed and returned.
+
+    Returns: timings, failures. timings is a dict of code: connect time (s)
+    for the instruments that came up, failures a dict of code: exception"""
+    timings = {}
+    failures = {}
+    if not codes:
+        return timings, failures
+
+    def _timed_init(code):
+        t0 = time.perf_counter()
+        instrs_func(code)
+        return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers or len(codes)) as pool:
+        futures = {pool.submit(_timed_init, code): code for code in codes}
+        for future in as_completed(futures):
+            code = futures[future]
+            try:
+                timings[code] = future.result()
+            except Exception as e:
+                failures[code] = e
+
+    for code in codes:
+        if code in timings:
+            print('{}: connected in {:.2f} s'.format(code, timings[code]))
+        else:
+            print('{}: FAILED ({}: {})'.format(code,
+                                               type(failures[code]).__name__,
+                                               failures[code]))
+    print('Initialized {} of {} instruments in {:.2f} s'.format(
+        len(timings), len(codes), time.perf_counter() - t0))
+    return timings, failures
+
+
+class Rack:
+    """The instruments of one setup, as described by a rack file (see
+    racks/ppms.yaml for the format). Nothing is imported or connected until
+    an instrument is asked for: rack.k6 or rack.get('k6') builds the
+    instrument the first time, applies its settings, puts it in builtins
+    (so it can be used as k6 afterwards, like the *_init functions do) and
+    returns the same object after that.
+
+    Use load_rack to get one, so that the parsed configuration and the
+    instruments already built are reused."""
+    def __init__(self, name, config):
+        self.name = name
+        self._instruments = {}
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._configure(config)
+
+    def _configure(self, config):
+        self.config = config
+        self.always = tuple(config.get('always') or ())
+        self.standard = tuple(config.get('standard') or ())
+        self.specs = {code.lower(): spec for code, spec in
+                      (config.get('instruments') or {}).items()}
+
+    @property
+    def codes(self):
+        """All the instrument codes in this rack"""
+        return tuple(self.specs)
 
-if sys.platform == 'win32':
-    from qcodes.instrument_drivers.nplab_drivers.QD import QD
+    @property
+    def connected(self):
+        """The instruments that have been built so far, by code"""
+        return dict(self._instruments)
 
+    def __getattr__(self, code):
+        if code.startswith('_') or code not in self.__dict__.get('specs', {}):
+            raise AttributeError('Rack {!r} has no instrument '
+                                 '{!r}'.format(self.__dict__.get('name'),
+                                               code))
+        return self.get(code)
 
-standardppms = ('k6', 'lockin1')  # ppms always initializes
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(self.specs))
+
+    def _lock(self, code):
+        with self._locks_lock:
+            return self._locks.setdefault(code, threading.Lock())
+
+    def get(self, code):
+        """Returns the instrument with this code, building it first if it
+        hasn't been used yet"""
+        code = code.lower()
+        if code in self._instruments:
+            return self._instruments[code]
+        if code not in self.specs:
+            raise KeyError('No instrument {!r} in the {} rack. Available: '
+                           '{}'.format(code, self.name, ', '.join(self.codes)))
+        # one lock per instrument so that parallel builds of different
+        # instruments don't wait on each other
+        with self._lock(code):
+            if code not in self._instruments:
+                self._instruments[code] = self._build(code, self.specs[code])
+        return self._instruments[code]
+
+    def _build(self, code, spec):
+        module_name, class_name = spec['driver'].rsplit('.', 1)
+        driver = getattr(import_module(module_name, __package__), class_name)
+        args = (code,)
+        if spec.get('address') is not None:
+            args += (spec['address'],)
+        instrument = driver(*args, **(spec.get('init') or {}))
+        for param, value in (spec.get('settings') or {}).items():
+            getattr(instrument, param)(value)
+        setattr(builtins, code, instrument)
+        return instrument
+
+    def init(self, *instruments):
+        """Builds the always-initialized instruments and the ones given by
+        code ('standard' stands for the rack's standard list). Instruments
+        marked main_thread are built here first; the rest connect in
+        parallel (see parallel_init).
+
+        Returns: timings, failures (as for parallel_init)"""
+        codes = _expand_codes(self.always + instruments, self.standard)
+        main = [c for c in codes if self.specs.get(c, {}).get('main_thread')]
+        for code in main:
+            self.get(code)
+        return parallel_init(self.get, [c for c in codes if c not in main])
+
+
+_racks = {}
+_racks_lock = threading.Lock()
+
+
+def load_rack(name):
+    """Returns the Rack for a setup name (ppms, triton, stick: the files in
+    racks/) or a path to a rack file. The parsed file is cached and only
+    read again when it changes on disk; instruments that were already built
+    are kept."""
+    if os.path.exists(name):
+        path = os.path.abspath(name)
+    else:
+        path = os.path.join(RACK_DIR, name + '.yaml')
+    mtime = os.path.getmtime(path)
+    with _racks_lock:
+        if path in _racks:
+            rack, loaded_mtime = _racks[path]
+            if loaded_mtime != mtime:
+                rack._configure(_load_yaml(path))
+        else:
+            name = os.path.splitext(os.path.basename(path))[0]
+            rack = Rack(name, _load_yaml(path))
+        _racks[path] = (rack, mtime)
+    return rack
 
 
 def ppms_init(*instruments):
@@ -48,33 +212,21 @@ def ppms_init(*instruments):
         k2015: The standard Keithley 2015 source-meter
         seekat: OpenDacs Seekat
         DAC_ADC: OpenDacs DAC_ADC
-        vdp: Daniel's van der pauw switch box"""
+        vdp: Daniel's van der pauw switch box
+
+        Addresses and settings are in racks/ppms.yaml. The instruments other
+        than the ppms connect in parallel (see parallel_init). Returns the
+        per-instrument timings and failures."""
     if sys.platform != 'win32':
         raise SystemError('Must be on Windows platform to use PPMS')
-
-    ppms_instrs('ppms')
-    for ind, inst in enumerate(instruments):
-        if inst.lower() == 'standard':
-            for sinstr in standardppms:
-                ppms_instrs(sinstr.lower())
-            # Put the standard PPMS initialization protocol here
-            time.sleep(1)
-            k6.compliance(0.2)
-            k6.AC_phasemark(1)
-            k6.AC_phasemark_offset(0)
-            instruments = ('ppms', *standardppms, *[i for i in instruments if i.lower() != 'standard'])
-        else:
-            ppms_instrs(inst.lower())
-
-
-standardtriton = ('srframe', 'lockin865')  # triton always initializes
+    return load_rack('ppms').init(*instruments)
 
 
 def triton_init(*instruments):
     """Enter the instrument codes (string) to initialize each of the following
         instruments (triton automatically inits as 'triton'):
 
-        standard: whatever you specify directly above in the tuple
+        standard: srframe and lockin865 (the standard list in the rack file)
         k6: keithley 6221
         lockin: The lock-in amplifier
         sr560: the stanford SR560 voltage pre-amp
@@ -83,132 +235,28 @@ def triton_init(*instruments):
         k2015: The standard Keithley 2015 source-meter
         seekat: OpenDacs Seekat
         DAC_ADC: OpenDacs DAC_ADC
-        vdp: Daniel's van der pauw switch box"""
+        vdp: Daniel's van der pauw switch box
 
-    triton_instrs('triton')
-    for ind, inst in enumerate(instruments):
-        if inst.lower() == 'standard':
-            for sinstr in standardtriton:
-                triton_instrs(sinstr.lower())
-            # Put the initialization for standard instruments here
+        Addresses and settings are in racks/triton.yaml. All instruments
+        connect in parallel (see parallel_init). Returns the per-instrument
+        timings and failures."""
+    return load_rack('triton').init(*instruments)
 
-            instruments = ('triton', *standardtriton, *[i for i in instruments if i.lower() != 'standard'])
-        else:
-            triton_instrs(inst.lower())
-            # Put any extra standards here
 
 def stick_setup_init(*instruments):
-    for inst in instruments:
-        stick_setup_instrs(inst.lower())
+    """Initializes the stick setup instruments by code (lakeshore,
+    lockin830, srdc, srframe, k2200; see racks/stick.yaml) in parallel.
+    Returns the per-instrument timings and failures."""
+    return load_rack('stick').init(*instruments)
+
 
 def ppms_instrs(instr_str):
-    if instr_str == 'k6':
-        k6 = Keithley_6221('k6', 'GPIB::12::INSTR')
-        builtins.k6 = k6
-    elif instr_str == 'k2182':
-        k2182 = Keithley_2182a('k2182', 'GPIB::7::INSTR')
-        builtins.k2182 = k2182
-    elif instr_str == 'k2015':
-        k2015 = Keithley_2000('k2015', 'GPIB::1::INSTR')
-        builtins.k2015 = k2015
-    elif instr_str == 'k2200':
-        k2200 = Keithley_2200('k2200', 'GPIB::19::INSTR')
-        builtins.k2200 = k2200
-    elif instr_str == 'ppms':
-        ppms = QD('ppms')
-        builtins.ppms = ppms
-    elif instr_str == 'seekat':
-        seekat = Seekat('seekat', 'COM6', timeout=8)
-        builtins.seekat = seekat
-    elif instr_str == 'dacadc':
-        dacadc = DAC_ADC('dacadc', 'COM9', timeout=8)
-        builtins.dacadc = dacadc
-    elif instr_str == 'lr700':
-        lr700 = LR_700('lr700', 'GPIB::18::INSTR')
-        builtins.lr700 = lr700
-    elif instr_str == 'lockin1':
-        lockin1 = SR830('lockin1', 'GPIB0::10::INSTR')
-        builtins.lockin1 = lockin1
-    elif instr_str == 'lockin2':
-        lockin2 = SR830('lockin2', 'GPIB0::1::INSTR')
-        builtins.lockin2 = lockin2
-    elif instr_str == 'vdp':
-        vdp = vdpArduino('vdp', 'COM10', timeout=6)
-        builtins.vdp = vdp
-    elif instr_str == 'srdc':
-        srdc = SRDC205('srdc', 'COM3')
-        builtins.srdc = srdc
+    load_rack('ppms').get(instr_str)
 
 
 def triton_instrs(instr_str):
-    if instr_str == 'triton':
-        triton = Triton('triton', 'triton.local', 33576)
-        builtins.triton = triton
-    # if instr_str == 'k6':
-    #     k6 = Keithley_6221('k6', 'GPIB::12::INSTR')
-    #     builtins.k6 = k6
-    elif instr_str == 'k2182':
-        k2182 = Keithley_2182a('k2182', 'GPIB::13::INSTR')
-        builtins.k2182 = k2182
-    elif instr_str == 'k2015':
-        k2015 = Keithley_2000('k2015', 'GPIB::1::INSTR')
-        builtins.k2015 = k2015
-    elif instr_str == 'k2200':
-        k2200 = Keithley_2200('k2200', 'GPIB1::23::INSTR')
-        builtins.k2200 = k2200
-    elif instr_str == 'seekat':
-        seekat = Seekat('seekat', 'COM6', timeout=8)
-        builtins.seekat = seekat
-    elif instr_str == 'dacadc':
-        dacadc = DAC_ADC('dacadc', 'COM9', timeout=8)
-        builtins.dacadc = dacadc
-    elif instr_str == 'lockin830':
-        lockin830 = SR830('lockin830', 'GPIB0::8::INSTR')
-        builtins.lockin830 = lockin830
-    elif instr_str == 'lockin830_2':
-        lockin830_2 = SR830('lockin830_2', 'GPIB0::3::INSTR')
-        builtins.lockin830_2 = lockin830_2
-    elif instr_str == 'lockin830_3':
-        lockin830_3 = SR830('lockin830_3', 'GPIB0::7::INSTR')
-        builtins.lockin830_3 = lockin830_3
-    elif instr_str == 'lockin865':
-        lockin865 = SR865A('lockin865', 'GPIB0::4::INSTR')
-        builtins.lockin865 = lockin865
-    elif instr_str == 'srframe':
-        srframe = SIM900('srframe', 'GPIB0::2::INSTR')
-        builtins.srframe = srframe
-    elif instr_str == 'vdp':
-        vdp = vdpArduino('vdp', 'COM10', timeout=6)
-        builtins.vdp = vdp
-    elif instr_str == 'sr560':
-        sr560 = SR560('sr560', 'COM5')
-        builtins.sr560 = sr560
-    elif instr_str == 'srdc':
-        srdc = SRDC205('srdc', 'COM3')
-        builtins.srdc = srdc
-    elif instr_str == 'k6':
-        k6 = Keithley_6221_rs232('k6', 'COM4')
-        builtins.k6 = k6
-    elif instr_str == 'sig1025':
-        sig1025 = Siglent1025('sig1025', 'USB0::0xF4ED::0xEE3A::SDG10GA4150294::INSTR')
-        builtins.sig1025 = sig1025
+    load_rack('triton').get(instr_str)
+
 
 def stick_setup_instrs(instr_str):
-    if instr_str == 'lakeshore':
-        lakeshore = Lakeshore211('lakeshore', 'COM5')  # second from the top usb port on the dongle
-        builtins.lakeshore = lakeshore
-    if instr_str == 'lockin830':
-        lockin830 = SR830('lockin830', 'GPIB0::8::INSTR') #refurbished lockin
-        builtins.lockin830 = lockin830
-    # if instr_str == 'lockinrefurb':
-    #     lockinrefurb = SR830('lockinrefurb', 'GPIB0::8::INSTR')
-    #     builtins.lockinrefurb = lockinrefurb
-    if instr_str == 'srdc':
-        srdc = SRDC205('srdc', 'COM3')  # second from bottom usb port on the dongle
-        builtins.srdc = srdc
-    if instr_str == 'srframe':
-        srframe = SIM900_stick('srframe', 'GPIB0::2::INSTR')  # 'COM1' is the DB9 port on the back of the computer. #COM6 is the upper USB port on the multi-port box
-        builtins.srframe = srframe
-    if instr_str == 'k2200':
-        k2200 = Keithley_2200('k2200', 'GPIB0::22::INSTR')
-        builtins.k2200 = k2200
+    load_rack('stick').get(instr_str)
@@ -6,8 +6,6 @@ from scipy.optimize import curve_fit
 import matplotlib.pyplot as plt
 import matplotlib.colors as colors
 from matplotlib.colors import Normalize
-import subprocess
-import sys
 
 
 def mov_average(array, window):
@@ -564,15 +562,32 @@ class DivSymLogNorm(Normalize):
         super().autoscale_None(A)
         self._transform_vmin_vmax()
 
-# # For use with nplab_qtplot_v0.2.5... Won't install if qtplot isn't installed
-reqs = subprocess.check_output([sys.executable, '-m', 'pip', 'freeze'])
-installed_packages = [r.decode() for r in reqs.split()]
-if 'qtplot==0.2.5' in installed_packages:
-    import qtplot
 
+def _installed_version(package):
+    """Returns the installed version string of package, or None if it isn't
+    installed. Reads the package metadata directly instead of running
+    pip freeze, which takes seconds."""
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:  # python < 3.8
+        from pkg_resources import get_distribution, DistributionNotFound
+        try:
+            return get_distribution(package).version
+        except DistributionNotFound:
+            return None
+    try:
+        return version(package)
+    except PackageNotFoundError:
+        return None
+
+
+# # For use with nplab_qtplot_v0.2.5... Won't install if qtplot isn't installed
+if _installed_version('qtplot') == '0.2.5':
     def qt2dplot(xdata, ydata, zdata):
         """import xdata, ydata as 1d arrays. Zdata as a 2d array
         This function plots the data in qtplot"""
+        import qtplot
+
         zs = zdata.shape
         xx, yy = np.mgrid[0:zs[0], 0:zs[1]]
         xd = np.tensordot(xdata, np.ones(zs[0]), axes=0).T
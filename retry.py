@@ -0,0 +1,169 @@
+""" Retry policy shared by the drivers of instruments that sometimes don't
+answer a query (LR_700, SR86x/SR865A).
+
+A RetryPolicy asks again with exponential backoff until the answer is good or
+the deadline of the call has passed, keeps count of the calls, retries and
+failures of its instrument, and stops querying for a while (circuit breaker)
+after several calls in a row have failed. A sweep with an instrument that
+stopped answering then gets the fallback value (nan, '') at once for every
+point instead of waiting out all the retries each time.
+
+Each instrument has its own policy as instrument.retry_policy, e.g.
+    lr.retry_policy.deadline = 1
+    lr.retry_policy.metrics()
+"""
+
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+_RAISE = object()
+
+
+class RetryError(TimeoutError):
+    """ A call still failed at its deadline (or after max_attempts) """
+
+
+class CircuitOpenError(RuntimeError):
+    """ A call wasn't made because the circuit breaker is open """
+
+
+class RetryPolicy:
+    """ Retry, deadline and circuit breaker settings and the counters of one
+    instrument.
+
+    Args:
+        name: used in the messages (the instrument name)
+        deadline: seconds from the start of a call after which it isn't
+            retried any more (None: no limit). A running attempt isn't
+            interrupted, so a call can take up to the deadline plus the
+            instrument timeout
+        max_attempts: attempts per call (None: as many as the deadline
+            allows)
+        initial_delay: wait (s) before the first retry
+        max_delay: longest wait (s) between retries
+        backoff: factor the wait grows by with each retry
+        exceptions: exception types that count as a failed attempt (any
+            other exception is raised right away)
+        breaker_threshold: failed calls in a row that open the circuit
+            breaker (None: never)
+        breaker_reset: seconds the breaker stays open. The next call after
+            that is tried again and closes the breaker if it succeeds
+        fallback: returned by a failed call (and while the breaker is open)
+            instead of raising RetryError or CircuitOpenError. Leave it out
+            to raise
+        on_retry: called with the error (or the bad answer) before each
+            retry, e.g. to clear a reply that may still come in
+    """
+    def __init__(self, name='', deadline=2.0, max_attempts=None,
+                 initial_delay=0.05, max_delay=0.5, backoff=2.0,
+                 exceptions=(), breaker_threshold=5, breaker_reset=30.0,
+                 fallback=_RAISE, on_retry=None):
+        self.name = name
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.exceptions = tuple(exceptions)
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.fallback = fallback
+        self.on_retry = on_retry
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        """ Sets the counters to zero and closes the breaker """
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+        self.consecutive_failures = 0
+        self.call_time = 0.0
+        self.last_error = None
+        self._open_until = None
+
+    @property
+    def breaker_open(self):
+        return (self._open_until is not None and
+                time.perf_counter() < self._open_until)
+
+    def metrics(self):
+        """ The counters as a dict: calls made, attempts, retries, failed
+        calls, calls rejected by the open breaker, failed calls in a row,
+        total time spent in calls (s), the last error and whether the
+        breaker is open """
+        return {'calls': self.calls, 'attempts': self.attempts,
+                'retries': self.retries, 'failures': self.failures,
+                'rejected': self.rejected,
+                'consecutive_failures': self.consecutive_failures,
+                'call_time': self.call_time,
+                'last_error': self.last_error,
+                'breaker_open': self.breaker_open}
+
+    def call(self, func, *args, retry_if=None, **kwargs):
+        """ Returns func(*args, **kwargs), calling it again while it raises
+        one of the exceptions or retry_if(answer) is true, as the settings
+        allow. If it never succeeds, returns the fallback or raises
+        RetryError """
+        if self.breaker_open:
+            self.rejected += 1
+            return self._fail(CircuitOpenError(
+                '{}: not asked, {} calls in a row failed (retrying in {:.0f} '
+                's)'.format(self.name, self.consecutive_failures,
+                            self._open_until - time.perf_counter())))
+
+        t0 = time.perf_counter()
+        deadline = None if self.deadline is None else t0 + self.deadline
+        delay = self.initial_delay
+        attempt = 0
+        self.calls += 1
+        while True:
+            attempt += 1
+            self.attempts += 1
+            try:
+                answer = func(*args, **kwargs)
+            except self.exceptions as e:
+                error = e
+            else:
+                if retry_if is None or not retry_if(answer):
+                    self.consecutive_failures = 0
+                    self._open_until = None
+                    self.call_time += time.perf_counter() - t0
+                    return answer
+                error = 'bad answer {!r}'.format(answer)
+            self.last_error = error
+
+            now = time.perf_counter()
+            if ((self.max_attempts is not None and
+                 attempt >= self.max_attempts) or
+                    (deadline is not None and now >= deadline)):
+                break
+            self.retries += 1
+            if self.on_retry is not None:
+                self.on_retry(error)
+            if deadline is not None:
+                delay = min(delay, deadline - now)
+            time.sleep(delay)
+            delay = min(delay*self.backoff, self.max_delay)
+
+        self.call_time += time.perf_counter() - t0
+        self.failures += 1
+        self.consecutive_failures += 1
+        if (self.breaker_threshold is not None and
+                self.consecutive_failures >= self.breaker_threshold):
+            self._open_until = time.perf_counter() + self.breaker_reset
+            log.warning('%s: %d calls in a row failed, not asking again for '
+                        '%.0f s', self.name, self.consecutive_failures,
+                        self.breaker_reset)
+        return self._fail(RetryError(
+            '{}: no good answer after {} attempts in {:.2f} s ({})'.format(
+                self.name, attempt, time.perf_counter() - t0, error)))
+
+    def _fail(self, error):
+        if self.fallback is _RAISE:
+            raise error
+        log.warning('%s', error)
+        return self.fallback
@@ -0,0 +1,44 @@
+""" Waiting for slow instrument operations (magnet sweeps, temperature
+changes) without querying the instrument as fast as possible the whole time.
+Used by Triton and QD.
+"""
+
+import time
+
+
+def wait_until(done, expected=0, timeout=None, poll_interval=1.0,
+               callback=None, early=0.9):
+    """ Waits until done() returns True.
+
+    Nothing is asked before early*expected seconds have passed (the sweep
+    can't be done yet); after that done() is called every poll_interval
+    seconds. Between the checks the waiting thread sleeps, so other threads
+    (e.g. a temperature logger) can use the instrument.
+
+    done: function returning True once the operation is complete
+    expected: expected duration of the operation (s), e.g. from the sweep
+        rate and the distance to go
+    timeout: seconds after which to give up (None: no limit)
+    poll_interval: seconds between calls of done() (and callback)
+    callback: called every poll_interval seconds while waiting, e.g. to
+        log the field and temperature
+    early: fraction of expected to sleep through before the first check
+
+    Returns: True if done, False at the timeout"""
+    t0 = time.perf_counter()
+    first = t0 + early*expected
+    deadline = None if timeout is None else t0 + timeout
+    while True:
+        now = time.perf_counter()
+        if now >= first and done():
+            return True
+        if deadline is not None and now >= deadline:
+            return False
+        if callback is not None:
+            callback()
+        wake = now + poll_interval
+        if now < first:
+            wake = min(wake, first)
+        if deadline is not None:
+            wake = min(wake, deadline)
+        time.sleep(max(wake - time.perf_counter(), 0))